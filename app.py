@@ -1,6 +1,5 @@
 import datetime
 import json
-import hashlib
 from pathlib import Path
 import streamlit as st
 
@@ -8,18 +7,17 @@ import streamlit as st
 from init_admin import create_default_admin
 create_default_admin()
 
-from auth import check_access
+from auth import check_access, hash_password
 from data_engine import (
     load_dataset,
     build_full_eda,
-    normalize_set_aside_column,
-    normalize_opportunity_type_column,
+    normalize_columns,
     build_final_output_table,
     to_excel_bytes,
     to_csv_bytes,
     apply_filters,
 )
-from llm_agent import summarize_dataset, create_llm_plan
+from llm_agent import stream_dataset_summary, create_llm_plan
 
 
 # -------------------------------------------------
@@ -66,16 +64,6 @@ def log_event(action: str, status: str, message: str = "", extra: dict | None =
 # -------------------------------------------------
 # USER MANAGEMENT FUNCTIONS (ADMIN ONLY)
 # -------------------------------------------------
-def hash_password(password: str) -> str:
-    """Hash a password using SHA256"""
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
-
-
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify a password against its hash"""
-    return hash_password(password) == hashed
-
-
 def load_users():
     """Load users from JSON file"""
     try:
@@ -96,8 +84,11 @@ def save_users(users):
             json.dump(users, f, indent=4)
         
         # Also save to GitHub Gist if configured
-        from auth import save_users_to_gist
+        from auth import save_users_to_gist, sync_users_to_db
         save_users_to_gist(users)
+
+        # Keep the login lookup table in step
+        sync_users_to_db(users)
         
         return True
     except Exception as e:
@@ -463,12 +454,11 @@ def show_survey():
     st.markdown("#### Dataset Understanding (Click to Generate)", unsafe_allow_html=True)
 
     if st.button("Generate Dataset Summary"):
-        with st.spinner("AI analyzing your dataset..."):
-            try:
-                summary = summarize_dataset(eda)
-            except Exception as e:
-                summary = f"(AI failed: {e})"
-        st.write(summary)
+        # Streamed, so the first sentences show while the rest generates
+        try:
+            st.write_stream(stream_dataset_summary(eda))
+        except Exception as e:
+            st.write(f"(AI failed: {e})")
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -509,8 +499,13 @@ def show_survey():
         # Step 2: Normalize
         status.update(label="Normalizing...", state="running")
         df2 = df.copy()
-        df2 = normalize_set_aside_column(df2, columns.get("set_aside_column") or "TypeOfSetAsideDescription", sa_patterns)
-        df2 = normalize_opportunity_type_column(df2, columns.get("opportunity_type_column") or "Type", opp_patterns)
+        df2 = normalize_columns(
+            df2,
+            columns.get("set_aside_column") or "TypeOfSetAsideDescription",
+            columns.get("opportunity_type_column") or "Type",
+            sa_patterns,
+            opp_patterns,
+        )
 
         # Step 3: Build final table
         status.update(label="Building final output...", state="running")
@@ -1,8 +1,70 @@
 import streamlit as st
+import base64
 import json
 import hashlib
+import hmac
 import requests
 import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import extra_streamlit_components as stx
+except ImportError:  # cookie login is skipped without it
+    stx = None
+
+try:
+    from argon2 import PasswordHasher
+except ImportError:  # unsalted SHA256 hashes only
+    PasswordHasher = None
+
+DB_PATH = "app.db"
+
+# Same pragmas as create_db.py
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-64000",
+)
+
+_conn = None
+_conn_lock = threading.RLock()
+
+# The user mirror is re-read from the Gist when older than this (seconds),
+# so password changes and removals made elsewhere reach this process
+USER_SYNC_TTL = int(os.getenv('USER_SYNC_TTL', '60'))
+# A miss or failed password check re-reads it, at most this often
+USER_RESYNC_MIN_INTERVAL = 5
+_synced_at = 0.0
+
+AUTH_COOKIE = "survey_agent_auth"
+AUTH_TOKEN_TTL = 86400
+
+# Without AUTH_SECRET, tokens only survive until the process restarts
+_AUTH_SECRET = (os.getenv('AUTH_SECRET') or secrets.token_hex(32)).encode('utf-8')
+
+# Argon2id cost, tunable per deployment (memory_cost is in KiB)
+_hasher = PasswordHasher(
+    time_cost=int(os.getenv('ARGON2_TIME_COST', '2')),
+    memory_cost=int(os.getenv('ARGON2_MEMORY_COST', '65536')),
+    parallelism=int(os.getenv('ARGON2_PARALLELISM', '1')),
+) if PasswordHasher else None
+
+# One keep-alive session for all Gist I/O (avoids a TLS handshake per call)
+_session = requests.Session()
+_session.headers.update({'Accept': 'application/vnd.github.v3+json'})
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.2),
+))
 
 def get_gist_config():
     """Get GitHub Gist configuration from environment variables"""
@@ -14,6 +76,11 @@ def get_gist_config():
         'gist_url': f'https://api.github.com/gists/{gist_id}' if gist_id else ''
     }
 
+def _gist_session(config):
+    """Shared session carrying the current GitHub token"""
+    _session.headers['Authorization'] = f"token {config['github_token']}"
+    return _session
+
 def load_users():
     """Load users from GitHub Gist or local file fallback"""
     config = get_gist_config()
@@ -21,11 +88,7 @@ def load_users():
     # Try GitHub Gist first (if configured)
     if config['gist_id'] and config['github_token']:
         try:
-            headers = {
-                'Authorization': f"token {config['github_token']}",
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            response = requests.get(config['gist_url'], headers=headers, timeout=5)
+            response = _gist_session(config).get(config['gist_url'], timeout=5)
             
             if response.status_code == 200:
                 gist_data = response.json()
@@ -63,11 +126,6 @@ def save_users_to_gist(users):
         return False
     
     try:
-        headers = {
-            'Authorization': f"token {config['github_token']}",
-            'Accept': 'application/vnd.github.v3+json'
-        }
-        
         data = {
             'files': {
                 'users.json': {
@@ -76,7 +134,7 @@ def save_users_to_gist(users):
             }
         }
         
-        response = requests.patch(config['gist_url'], headers=headers, json=data, timeout=5)
+        response = _gist_session(config).patch(config['gist_url'], json=data, timeout=5)
         
         if response.status_code == 200:
             print(f"✓ Saved {len(users)} users to GitHub Gist")
@@ -89,24 +147,170 @@ def save_users_to_gist(users):
         print(f"✗ Error saving to GitHub Gist: {e}")
         return False
 
-def hash_password(password: str) -> str:
-    """Hash a password using SHA256"""
+def _get_conn():
+    """
+    Shared SQLite connection holding a mirror of the Gist user list in
+    its own users_mirror table (create_db.py's users table is left
+    alone), indexed on lower(username).
+    """
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for p in SQLITE_PRAGMAS:
+                conn.execute(f"PRAGMA {p}")
+            with conn:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS users_mirror (
+                    username TEXT PRIMARY KEY,
+                    password TEXT NOT NULL,
+                    role TEXT NOT NULL
+                )''')
+                conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_mirror_lower_username "
+                    "ON users_mirror(lower(username))"
+                )
+            _conn = conn
+        return _conn
+
+def sync_users_to_db(users):
+    """Replace the SQLite user mirror with the given user list"""
+    global _synced_at
+    conn = _get_conn()
+    rows = [(u['username'], u['password'], u.get('role', 'user')) for u in users]
+    with _conn_lock, conn:
+        conn.execute("DELETE FROM users_mirror")
+        conn.executemany(
+            "INSERT OR REPLACE INTO users_mirror (username, password, role) VALUES (?, ?, ?)", rows
+        )
+        _synced_at = time.time()
+
+def refresh_users(max_age: float = USER_SYNC_TTL) -> bool:
+    """Re-read the user list into the mirror if it is older than max_age"""
+    if time.time() - _synced_at <= max_age:
+        return False
+    sync_users_to_db(load_users())
+    return True
+
+def get_user(username: str):
+    """Indexed, case-insensitive lookup of a single user"""
+    refresh_users()
+    conn = _get_conn()
+    with _conn_lock:
+        row = conn.execute(
+            "SELECT username, password, role FROM users_mirror WHERE lower(username) = ? LIMIT 1",
+            (username.lower(),),
+        ).fetchone()
+    return dict(row) if row else None
+
+def _sha256(password: str) -> str:
     return hashlib.sha256(password.encode('utf-8')).hexdigest()
 
+def hash_password(password: str) -> str:
+    """Hash a password using Argon2id (SHA256 if argon2-cffi is missing)"""
+    if _hasher is None:
+        return _sha256(password)
+    return _hasher.hash(password)
+
 def verify_password(password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
+    """Verify a password against an Argon2 or legacy SHA256 hash"""
     try:
-        return hash_password(password) == hashed_password
-    except:
+        if hashed_password.startswith('$argon2'):
+            return _hasher is not None and _hasher.verify(hashed_password, password)
+        return hmac.compare_digest(_sha256(password), hashed_password)
+    except Exception:
+        # mismatch, malformed hash or non-string input
         return False
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True for legacy SHA256 hashes and Argon2 hashes with outdated cost"""
+    if _hasher is None:
+        return False
+    if not hashed_password.startswith('$argon2'):
+        return True
+    return _hasher.check_needs_rehash(hashed_password)
+
+def _upgrade_password_hash(username: str, password: str):
+    """Re-hash a user's password with the current Argon2 settings"""
+    try:
+        users = load_users()
+        for u in users:
+            if u['username'] == username:
+                u['password'] = hash_password(password)
+                break
+        else:
+            return
+
+        with open('users.json', 'w') as f:
+            json.dump(users, f, indent=4)
+        save_users_to_gist(users)
+        sync_users_to_db(users)
+    except Exception as e:
+        # Login still succeeds; the upgrade is retried next time
+        print(f"Password hash upgrade failed: {e}")
+
+def _sign(payload: bytes) -> str:
+    return hmac.new(_AUTH_SECRET, payload, hashlib.sha256).hexdigest()
+
+def make_auth_token(username: str, role: str) -> str:
+    """Signed token: base64(json{u, r, exp}) + '.' + HMAC-SHA256"""
+    payload = json.dumps({"u": username, "r": role, "exp": int(time.time()) + AUTH_TOKEN_TTL})
+    encoded = base64.urlsafe_b64encode(payload.encode('utf-8'))
+    return f"{encoded.decode('ascii')}.{_sign(encoded)}"
+
+def read_auth_token(token: str):
+    """Return the token payload, or None if it is malformed, forged or expired"""
+    try:
+        encoded, signature = token.rsplit(".", 1)
+        if not hmac.compare_digest(signature, _sign(encoded.encode('ascii'))):
+            return None
+        payload = json.loads(base64.urlsafe_b64decode(encoded))
+        if payload["exp"] < time.time():
+            return None
+        return payload
+    except Exception:
+        return None
+
+def _restore_from_cookie(cookies) -> bool:
+    """
+    Authenticate the session from a valid auth cookie. No password check;
+    the Gist is only read when the user mirror is older than USER_SYNC_TTL.
+    """
+    token = cookies.get(AUTH_COOKIE)
+    payload = read_auth_token(token) if token else None
+    if not payload:
+        return False
+
+    # The user must still exist; the role comes from the lookup table
+    user = get_user(payload["u"])
+    if not user:
+        return False
+
+    st.session_state["authenticated"] = True
+    st.session_state["role"] = user["role"]
+    st.session_state["username"] = user["username"]
+    return True
+
 def check_access():
     """
     Username/password authentication using GitHub Gist with local fallback
     """
+    cookies = stx.CookieManager(key="auth_cookies") if stx else None
+
     if st.session_state.get("authenticated"):
+        # Set after the login rerun so the cookie component actually renders
+        token = st.session_state.pop("auth_token_pending", None)
+        if token and cookies is not None:
+            cookies.set(
+                AUTH_COOKIE, token,
+                expires_at=datetime.now() + timedelta(seconds=AUTH_TOKEN_TTL),
+            )
         return  # already logged in
 
+    if cookies is not None and _restore_from_cookie(cookies):
+        return
+
     st.title("Survey Agent – Sign In")
     st.write("Please enter your username and password.")
 
@@ -119,19 +323,29 @@ def check_access():
             st.error("Please enter both username and password.")
             st.stop()
         
-        users = load_users()
+        user = get_user(username)
+        if user is None or not verify_password(password, user['password']):
+            # Unknown or wrong password locally - the Gist may have changed
+            if refresh_users(USER_RESYNC_MIN_INTERVAL):
+                user = get_user(username)
+            else:
+                user = None
+
         user_found = None
-        
-        for user in users:
-            if user['username'].lower() == username.lower():
-                if verify_password(password, user['password']):
-                    user_found = user
-                    break
+        if user and verify_password(password, user['password']):
+            user_found = user
         
         if user_found:
+            # Move legacy SHA256 (or outdated Argon2) hashes to current settings
+            if password_needs_rehash(user_found['password']):
+                _upgrade_password_hash(user_found['username'], password)
+
             st.session_state["authenticated"] = True
             st.session_state["role"] = user_found["role"]
             st.session_state["username"] = user_found["username"]
+            st.session_state["auth_token_pending"] = make_auth_token(
+                user_found["username"], user_found["role"]
+            )
             st.success("Login successful. Loading workspace...")
             st.rerun()
         else:
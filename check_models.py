@@ -1,19 +1,38 @@
+import json
+import os
+import time
 from pathlib import Path
 from dotenv import load_dotenv
-import os
 
 # Force-load .env from project root
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-print("DEBUG: ENV PATH =", env_path)
-print("DEBUG: GEMINI KEY (first 5 chars) =", str(os.getenv("GEMINI_API_KEY"))[:5])
+# Model list is cached on disk so repeated runs skip the API call
+CACHE = Path(__file__).resolve().parent / ".cache" / "models.json"
+CACHE_TTL = 3600
 
-import google.generativeai as genai
-import os
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+def list_model_names(refresh: bool = False):
+    if not refresh and CACHE.exists() and time.time() - CACHE.stat().st_mtime < CACHE_TTL:
+        return json.loads(CACHE.read_text())
+
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    names = [m.name for m in genai.list_models()]
+
+    CACHE.parent.mkdir(exist_ok=True)
+    CACHE.write_text(json.dumps(names))
+    return names
+
+
+if __name__ == "__main__":
+    import sys
+
+    print("DEBUG: ENV PATH =", env_path)
+    print("DEBUG: GEMINI KEY (first 5 chars) =", str(os.getenv("GEMINI_API_KEY"))[:5])
 
-print("Available models:")
-for m in genai.list_models():
-    print(m.name)
\ No newline at end of file
+    print("Available models:")
+    for name in list_model_names(refresh="--refresh" in sys.argv):
+        print(name)
@@ -1,35 +1,57 @@
 import sqlite3
-import hashlib
-import os
+from dotenv import load_dotenv
 
-# Create the SQLite database if it doesn't exist
-if not os.path.exists("app.db"):
-    conn = sqlite3.connect("app.db")  # Create a new SQLite database file
-    cursor = conn.cursor()
+# Load environment variables from .env file
+load_dotenv()
 
+# After load_dotenv so the seed hash uses the app's ARGON2_* settings
+from auth import hash_password
+
+# WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-64000",
+)
+
+# Safe to re-run: app.db may already exist (auth.py opens it for the
+# users_mirror table), so every step only fills in what is missing
+conn = sqlite3.connect("app.db")
+cursor = conn.cursor()
+
+for p in PRAGMAS:
+    cursor.execute(f"PRAGMA {p}")
+
+# Schema and seed are committed once when the block exits
+with conn:
     # Create the users table (username, hashed password, role)
     cursor.execute('''
-    CREATE TABLE users (
+    CREATE TABLE IF NOT EXISTS users (
         username TEXT PRIMARY KEY,
         password TEXT NOT NULL,
         role TEXT NOT NULL
     )''')
 
+    # Case-insensitive login lookups
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_lower_username ON users(lower(username))")
+
     # Create the admin_logs table to track actions performed by admin
     cursor.execute('''
-    CREATE TABLE admin_logs (
+    CREATE TABLE IF NOT EXISTS admin_logs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         action TEXT NOT NULL,
         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
     )''')
 
-    # Check if super admin exists, create if not
-    cursor.execute("SELECT * FROM users WHERE username = 'super_admin'")
-    if cursor.fetchone() is None:
-        cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", 
-                       ('super_admin', hashlib.sha256('super_admin_password'.encode()).hexdigest(), 'admin'))
-        conn.commit()
+    # Logs are read by time range
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_admin_logs_ts ON admin_logs(timestamp)")
+
+    # Create super admin if not exists
+    cursor.execute("INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)",
+                   ('super_admin', hash_password('super_admin_password'), 'admin'))
 
-    conn.close()
+conn.close()
 
 print("Database setup complete.")
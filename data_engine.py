@@ -1,38 +1,111 @@
+import csv
 import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, date
-import pytz
+from zoneinfo import ZoneInfo
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator, plain substring scan otherwise
+    ahocorasick = None
+
+try:
+    import xlsxwriter
+except ImportError:  # streaming Excel writer, openpyxl otherwise
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pandas' own CSV reader/writer only
+    pa = None
 
 
 # -------------------------------------------------
 # UNIVERSAL SAFE DATE CONVERTER
 # -------------------------------------------------
+# Excel stores dates as days since 1899-12-30
+_EXCEL_EPOCH = "1899-12-30"
+_ISO_DATE = r"\d{4}-\d{2}-\d{2}"
+_US_DATE = r"\d{1,2}/\d{1,2}/\d{4}"
+# A UTC offset/zone right after a clock time; dropped to keep local time
+_TZ_SUFFIX = r"(\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:\s*[AaPp][Mm])?)\s*(?:Z|UTC|GMT|[ECMPA][SD]T|[+-]\d{2}(?::?\d{2})?)$"
+
+
+def _to_datetime(values, **kwargs) -> pd.Series:
+    # Mixed UTC offsets can't share one dtype; settle them in UTC
+    try:
+        return pd.to_datetime(values, errors="coerce", **kwargs)
+    except ValueError:
+        return pd.to_datetime(values, errors="coerce", utc=True, **kwargs)
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    """
+    pd.to_datetime with the column's format worked out from a 20-value
+    sample, so the full parse can skip per-value format inference:
+      numeric       -> Excel serial day numbers
+      YYYY-MM-DD... -> only the leading date is parsed, so any time or
+                       UTC offset is ignored and the local day is kept
+      M/D/YYYY      -> fixed US format
+      anything else -> format="mixed", trailing UTC offsets dropped
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.to_datetime(series, unit="D", origin=_EXCEL_EPOCH, errors="coerce")
+
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+        return _to_datetime(series)
+
+    sample = series.dropna().head(20)
+    if sample.empty or not all(isinstance(v, str) for v in sample):
+        # empty, or an object column of datetime/date values
+        return _to_datetime(series)
+
+    if sample.str.match(_ISO_DATE).all():
+        head = _arrow_strings(series).str.slice(0, 10)
+        return pd.to_datetime(head, format="%Y-%m-%d", errors="coerce")
+    if sample.str.fullmatch(_US_DATE).all():
+        return pd.to_datetime(series, format="%m/%d/%Y", errors="coerce", cache=True)
+    local = _arrow_strings(series).str.replace(_TZ_SUFFIX, r"\1", regex=True)
+    return _to_datetime(local, format="mixed", cache=True)
+
+
+def _to_day(ts):
+    # Midnight of the local calendar day; offsets are dropped, not converted
+    if ts is pd.NaT:
+        return ts
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.normalize()
+
+
 def force_date(series: pd.Series) -> pd.Series:
     """
-    Convert ANY series into datetime.date values.
+    Convert ANY series into midnight datetime64 values (NaT if unparseable).
     NEVER raises .dt errors.
     """
-    try:
-        # First attempt — pandas conversion
-        s = pd.to_datetime(series, errors="coerce")
-        return s.dt.date
-    except Exception:
-        # Absolute fallback — convert cell-by-cell
-        def safe(val):
-            try:
-                return pd.to_datetime(val, errors="coerce").date()
-            except:
-                return None
-        return series.apply(safe)
+    s = _parse_dates(series)
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        # object result (e.g. aware values in several zones on pandas 2)
+        s = pd.to_datetime(s, errors="coerce", utc=True)
+    if s.dt.tz is not None:
+        s = s.dt.tz_localize(None)
+    return s.dt.normalize()
 
 
 # -------------------------------------------------
 # COLUMN PICKER
 # -------------------------------------------------
-def pick_first_existing(df: pd.DataFrame, *names, default=None):
+def pick_first_existing(df: pd.DataFrame, *names, default=None, cols=None):
+    # cols: a prebuilt set of df's column names, for repeated lookups
+    if cols is None:
+        cols = df.columns
     for name in names:
-        if name and name in df.columns:
+        if name and name in cols:
             return name
     return default
 
@@ -40,18 +113,65 @@ def pick_first_existing(df: pd.DataFrame, *names, default=None):
 # -------------------------------------------------
 # LOAD DATASET
 # -------------------------------------------------
+def _read_csv_arrow(uploaded_file, encoding: str) -> pd.DataFrame:
+    """
+    Multi-threaded pyarrow parse into Arrow-backed columns. Called
+    directly rather than via engine="pyarrow" so ISO timestamps with
+    offsets stay strings: pyarrow would convert them to UTC and shift
+    local due dates. Plain YYYY-MM-DD columns still load as dates.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    table = pacsv.read_csv(
+        uploaded_file,
+        read_options=pacsv.ReadOptions(encoding=encoding),
+        convert_options=pacsv.ConvertOptions(
+            timestamp_parsers=["%Y-%m-%d"],
+            strings_can_be_null=True,
+        ),
+    )
+    # Undecodable text comes back as binary columns instead of an error
+    if any(pa.types.is_binary(field.type) for field in table.schema):
+        raise UnicodeDecodeError(encoding, b"", 0, 1, "CSV is not valid " + encoding)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _read_csv(uploaded_file, encoding: str) -> pd.DataFrame:
+    # pyarrow first, then the C engine, python engine only for parser errors
+    uploaded_file.seek(0)
+    try:
+        return _read_csv_arrow(uploaded_file, encoding)
+    except UnicodeDecodeError:
+        raise
+    except (ImportError, ValueError):
+        pass
+
+    uploaded_file.seek(0)
+    try:
+        return pd.read_csv(uploaded_file, encoding=encoding)
+    except pd.errors.ParserError:
+        uploaded_file.seek(0)
+        return pd.read_csv(uploaded_file, encoding=encoding, engine="python")
+
+
 def load_dataset(uploaded_file) -> pd.DataFrame:
     name = uploaded_file.name.lower()
 
     if name.endswith(".csv"):
         try:
-            return pd.read_csv(uploaded_file, encoding="utf-8")
-        except:
-            return pd.read_csv(uploaded_file, encoding="latin1")
+            return _read_csv(uploaded_file, "utf-8")
+        except UnicodeDecodeError:
+            return _read_csv(uploaded_file, "latin1")
 
     if name.endswith(".xlsx") or name.endswith(".xls"):
+        # Rust calamine reader when installed, openpyxl otherwise
         uploaded_file.seek(0)
-        return pd.read_excel(uploaded_file, engine="openpyxl")
+        try:
+            return pd.read_excel(uploaded_file, engine="calamine", dtype_backend="pyarrow")
+        except ImportError:
+            uploaded_file.seek(0)
+            return pd.read_excel(uploaded_file, engine="openpyxl", dtype_backend="pyarrow")
 
     raise ValueError("Unsupported file type")
 
@@ -66,119 +186,284 @@ def build_full_eda(df: pd.DataFrame) -> Dict:
         "columns": []
     }
 
-    for col in df.columns:
-        ser = df[col]
+    # Whole-frame passes instead of one per column
+    non_null = df.notna().sum().tolist()
+    dtypes = df.dtypes.astype(str).tolist()
+
+    for i, col in enumerate(df.columns):
+        # Leading 200 non-null values are enough for an LLM-facing sample
+        head = df.iloc[:, i].dropna().head(200)
         eda["columns"].append({
             "name": col,
-            "dtype": str(ser.dtype),
-            "non_null_count": int(ser.notna().sum()),
-            "example_values": [str(v) for v in ser.dropna().unique()[:10]]
+            "dtype": dtypes[i],
+            "non_null_count": int(non_null[i]),
+            "example_values": head.drop_duplicates().head(10).astype(str).tolist()
         })
 
     return eda
 
 
+# -------------------------------------------------
+# MULTI-PATTERN MATCHING
+# -------------------------------------------------
+def _pattern_key(patterns: Dict) -> tuple:
+    """
+    Hashable, lowercased form of a {bucket: [patterns]} dict; this is
+    what the automaton and regex caches are keyed on.
+    """
+    return tuple(
+        (bucket, tuple(p.lower() for p in pats if p))
+        for bucket, pats in patterns.items()
+    )
+
+
+def _merge_patterns(base_key: tuple, ai_patterns: Optional[Dict]) -> tuple:
+    # AI buckets extend (or append to) the built-in ones, in order
+    if not ai_patterns:
+        return base_key
+
+    merged = {bucket: list(pats) for bucket, pats in base_key}
+    for bucket, pats in ai_patterns.items():
+        if pats:
+            merged.setdefault(bucket.strip(), []).extend(pats)
+    return _pattern_key(merged)
+
+
+@lru_cache(maxsize=32)
+def _build_automaton(pattern_key: tuple):
+    """
+    One Aho-Corasick automaton over every pattern of every bucket.
+    Each word maps to (priority, bucket); priority is the bucket's
+    position in the pattern key, so earlier buckets win ties.
+    """
+    automaton = ahocorasick.Automaton()
+    for priority, (bucket, pats) in enumerate(pattern_key):
+        for p in pats:
+            if p not in automaton:
+                automaton.add_word(p, (priority, bucket))
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=32)
+def _compile_patterns(pattern_key: tuple) -> tuple:
+    # One precompiled alternation per non-empty bucket
+    return tuple(
+        (bucket, re.compile("|".join(re.escape(p) for p in pats)))
+        for bucket, pats in pattern_key
+        if pats
+    )
+
+
+def _first_bucket(automaton, value: str):
+    best = None
+    for _, hit in automaton.iter(value):
+        if best is None or hit[0] < best[0]:
+            best = hit
+    return best[1] if best else None
+
+
+def _arrow_strings(series: pd.Series) -> pd.Series:
+    """
+    The column as Arrow-backed strings, so .str methods run in Arrow's
+    native kernels. Columns that already are (pyarrow CSV loads) pass
+    through untouched.
+    """
+    dtype = series.dtype
+    if pd.api.types.is_string_dtype(dtype) and (
+        isinstance(dtype, pd.ArrowDtype) or getattr(dtype, "storage", None) == "pyarrow"
+    ):
+        return series
+    try:
+        return series.astype("string[pyarrow]")
+    except ImportError:
+        return series.astype("string")
+
+
+def _lower_strings(series: pd.Series) -> pd.Series:
+    """
+    Lowercased, whitespace-trimmed strings with "" for missing values,
+    as one chain of Arrow kernels over the string buffer.
+    """
+    s = _arrow_strings(series)
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return s.str.lower().fillna("").str.strip()
+
+    arr = pc.utf8_trim_whitespace(pc.utf8_lower(pa.array(s))).fill_null("")
+    dtype = pd.StringDtype("pyarrow")
+    out = arr.to_pandas(types_mapper={pa.string(): dtype, pa.large_string(): dtype}.get)
+    return pd.Series(out.array, index=s.index)
+
+
+def _select_buckets(lowered: pd.Series, pattern_key: tuple, default: str) -> np.ndarray:
+    """
+    Vectorized classification: one regex alternation per bucket, one
+    str.contains pass each, folded with np.select in bucket order.
+    """
+    buckets, conds = [], []
+    for bucket, rx in _compile_patterns(pattern_key):
+        buckets.append(bucket)
+        conds.append(lowered.str.contains(rx).to_numpy(dtype=bool))
+    return np.select(conds, buckets, default=default).astype(object)
+
+
+def _bucket_map(lowered: pd.Series, pattern_key: tuple, default: str) -> Dict:
+    """
+    Classify each distinct lowered value once (automaton if available,
+    regex otherwise); callers broadcast the result with Series.map.
+    """
+    uniq = pd.Series(lowered.unique())
+    if ahocorasick is not None:
+        automaton = _build_automaton(pattern_key)
+        labels = [_first_bucket(automaton, u) or default for u in uniq]
+    else:
+        labels = _select_buckets(uniq, pattern_key, default)
+    return dict(zip(uniq, labels))
+
+
 # -------------------------------------------------
 # NORMALIZATION: SET-ASIDE
 # -------------------------------------------------
-def _fallback_set_aside_patterns():
-    return {
-        "SDVOSB": ["sdvosb", "service-disabled", "service disabled"],
-        "WOSB": ["wosb", "women"],
-        "TOTAL SMALL BUSINESS SET ASIDE": ["total small business", "100% small business"],
-        "VETERAN OWNED SMALL BUSINESS (VOSB)": ["vosb", "veteran"],
-        "SBA Certified Economically Disadvantaged WOSB (EDWOSB) Program Set-Aside (FAR 19.15)": [
-            "edwosb", "economically disadvantaged"
-        ],
-        "NO SET-ASIDE": ["no set aside", "none", "unrestricted"]
-    }
+_EMPTY_TOKENS = frozenset(("", "none", "null", "n/a", "na"))
 
 
-def normalize_set_aside_column(df, col, ai_patterns=None, new_col="Normalized_Set_Aside"):
+_SET_ASIDE_PATTERNS = _pattern_key({
+    "SDVOSB": ["sdvosb", "service-disabled", "service disabled"],
+    "WOSB": ["wosb", "women"],
+    "TOTAL SMALL BUSINESS SET ASIDE": ["total small business", "100% small business"],
+    "VETERAN OWNED SMALL BUSINESS (VOSB)": ["vosb", "veteran"],
+    "SBA Certified Economically Disadvantaged WOSB (EDWOSB) Program Set-Aside (FAR 19.15)": [
+        "edwosb", "economically disadvantaged"
+    ],
+    "NO SET-ASIDE": ["no set aside", "none", "unrestricted"]
+})
+
+
+def _lowered_column(df, col) -> pd.Series:
+    return _lower_strings(df[col])
+
+
+def _set_aside_values(df, col, ai_patterns=None, lowered=None):
     if col not in df.columns:
-        df[new_col] = pd.NA
-        return df
+        return pd.NA
 
-    base = _fallback_set_aside_patterns()
-    ai_patterns = ai_patterns or {}
+    pattern_key = _merge_patterns(_SET_ASIDE_PATTERNS, ai_patterns)
 
-    for bucket, list_p in ai_patterns.items():
-        if list_p:
-            base.setdefault(bucket.strip(), []).extend(list_p)
+    if lowered is None:
+        lowered = _lowered_column(df, col)
 
-    lowered = df[col].astype(str).str.lower()
+    mapping = _bucket_map(lowered, pattern_key, "NO SET-ASIDE")
+    for token in _EMPTY_TOKENS:
+        if token in mapping:
+            mapping[token] = None
 
-    def classify(v):
-        v = v.strip().lower()
-        if v in ("", "none", "null", "n/a"):
-            return None
-        for bucket, pats in base.items():
-            for p in pats:
-                if p.lower() in v:
-                    return bucket
-        return "NO SET-ASIDE"
+    return pd.Categorical(lowered.map(mapping), categories=[b for b, _ in pattern_key])
 
-    df[new_col] = lowered.apply(classify)
+
+def normalize_set_aside_column(df, col, ai_patterns=None, new_col="Normalized_Set_Aside"):
+    df[new_col] = _set_aside_values(df, col, ai_patterns)
     return df
 
 
 # -------------------------------------------------
 # NORMALIZATION: OPPORTUNITY TYPE
 # -------------------------------------------------
-def _fallback_opp_patterns():
-    return {
-        "Solicitation": ["solicitation", "combined synopsis"],
-        "Presolicitation": ["presolicitation"],
-        "Sources Sought": ["sources sought", "rfi", "request for information"]
-    }
+OPP_TYPE_ORDER = ["Solicitation", "Presolicitation", "Sources Sought", "Other"]
 
 
-def normalize_opportunity_type_column(df, col, ai_patterns=None, new_col="Normalized_Opportunity_Type"):
+def _opp_type_dtype(buckets) -> pd.CategoricalDtype:
+    extra = [b for b in buckets if b not in OPP_TYPE_ORDER]
+    return pd.CategoricalDtype(OPP_TYPE_ORDER + extra, ordered=True)
+
+
+_OPP_TYPE_PATTERNS = _pattern_key({
+    "Solicitation": ["solicitation", "combined synopsis"],
+    "Presolicitation": ["presolicitation"],
+    "Sources Sought": ["sources sought", "rfi", "request for information"]
+})
+
+
+def _opp_type_values(df, col, ai_patterns=None, lowered=None):
     if col not in df.columns:
-        df[new_col] = "Other"
-        return df
+        return pd.Categorical(["Other"] * len(df), dtype=_opp_type_dtype([]))
+
+    pattern_key = _merge_patterns(_OPP_TYPE_PATTERNS, ai_patterns)
 
-    patterns = _fallback_opp_patterns()
-    ai_patterns = ai_patterns or {}
+    if lowered is None:
+        lowered = _lowered_column(df, col)
+    mapping = _bucket_map(lowered, pattern_key, "Other")
+    return pd.Categorical(lowered.map(mapping), dtype=_opp_type_dtype(b for b, _ in pattern_key))
 
-    for bucket, patlist in ai_patterns.items():
-        if patlist:
-            patterns.setdefault(bucket.strip(), []).extend(patlist)
 
-    lowered = df[col].astype(str).str.lower()
+def normalize_opportunity_type_column(df, col, ai_patterns=None, new_col="Normalized_Opportunity_Type"):
+    df[new_col] = _opp_type_values(df, col, ai_patterns)
+    return df
 
-    def classify(v):
-        v = v.strip().lower()
-        for bucket, pats in patterns.items():
-            for p in pats:
-                if p.lower() in v:
-                    return bucket
-        return "Other"
 
-    df[new_col] = lowered.apply(classify)
+# -------------------------------------------------
+# NORMALIZATION: BOTH COLUMNS
+# -------------------------------------------------
+PARALLEL_MIN_ROWS = 10_000
+
+
+def normalize_columns(df, set_aside_col, opp_type_col, set_aside_patterns=None, opp_type_patterns=None):
+    """
+    Add Normalized_Set_Aside and Normalized_Opportunity_Type.
+    On large frames the two classifications run on separate threads;
+    both only read df, and the results are assigned afterwards.
+    When both point at the same source column it is lowered once.
+    """
+    lowered = None
+    if set_aside_col == opp_type_col and set_aside_col in df.columns:
+        lowered = _lowered_column(df, set_aside_col)
+
+    if len(df) > PARALLEL_MIN_ROWS:
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            set_aside = ex.submit(_set_aside_values, df, set_aside_col, set_aside_patterns, lowered)
+            opp_type = ex.submit(_opp_type_values, df, opp_type_col, opp_type_patterns, lowered)
+            set_aside, opp_type = set_aside.result(), opp_type.result()
+    else:
+        set_aside = _set_aside_values(df, set_aside_col, set_aside_patterns, lowered)
+        opp_type = _opp_type_values(df, opp_type_col, opp_type_patterns, lowered)
+
+    df["Normalized_Set_Aside"] = set_aside
+    df["Normalized_Opportunity_Type"] = opp_type
     return df
 
 
 # -------------------------------------------------
 # FINAL OUTPUT TABLE
 # -------------------------------------------------
-def build_final_output_table(df: pd.DataFrame, column_map: Dict, drop_no_set_aside=True):
-    tmp = df.copy()
+def _opp_type_sort_key(opp: pd.Series) -> pd.Series:
+    # Normalized output is already an ordered categorical in OPP_TYPE_ORDER
+    if isinstance(opp.dtype, pd.CategoricalDtype):
+        if opp.cat.ordered:
+            return opp
+        return opp.astype(_opp_type_dtype(opp.cat.categories))
+    return opp.astype(_opp_type_dtype(opp.dropna().unique()))
 
-    # Drop unwanted set-asides
-    if drop_no_set_aside and "Normalized_Set_Aside" in tmp.columns:
-        tmp = tmp[tmp["Normalized_Set_Aside"].notna()]
-        tmp = tmp[tmp["Normalized_Set_Aside"] != "NO SET-ASIDE"]
 
-    # Column resolution
+def build_final_output_table(df: pd.DataFrame, column_map: Dict, drop_no_set_aside=True):
+    # Drop unwanted set-asides (single mask, no full-frame copy);
+    # no mask at all when nothing is dropped
+    mask = None
+    if drop_no_set_aside and "Normalized_Set_Aside" in df.columns:
+        norm = df["Normalized_Set_Aside"]
+        mask = norm.notna() & (norm != "NO SET-ASIDE")
+
+    # Column resolution (one set for every membership test below)
+    cols = frozenset(df.columns)
     sol_num = column_map.get("solicitation_number") or pick_first_existing(
-        tmp, "SolicitationNumber", "NoticeId", "NoticeID"
+        df, "SolicitationNumber", "NoticeId", "NoticeID", cols=cols
     )
-    title = column_map.get("title") or pick_first_existing(tmp, "Title", "Description")
-    agency = column_map.get("agency") or pick_first_existing(tmp, "Agency", "Office")
+    title = column_map.get("title") or pick_first_existing(df, "Title", "Description", cols=cols)
+    agency = column_map.get("agency") or pick_first_existing(df, "Agency", "Office", cols=cols)
 
     sol_date = column_map.get("solicitation_date") or pick_first_existing(
-        tmp, "PostedDate", "NoticeDate", "SolicitationDate"
+        df, "PostedDate", "NoticeDate", "SolicitationDate", cols=cols
     )
 
     # Validate allowed solicitation date columns
@@ -186,7 +471,7 @@ def build_final_output_table(df: pd.DataFrame, column_map: Dict, drop_no_set_asi
         raise ValueError(f"Invalid solicitation_date column chosen: {sol_date}")
 
     due_date = column_map.get("due_date") or pick_first_existing(
-        tmp, "ResponseDeadLine", "ResponseDate", "DueDate"
+        df, "ResponseDeadLine", "ResponseDate", "DueDate", cols=cols
     )
 
     # Validate allowed due date columns
@@ -194,48 +479,52 @@ def build_final_output_table(df: pd.DataFrame, column_map: Dict, drop_no_set_asi
         raise ValueError(f"Invalid due_date column chosen: {due_date}")
 
     uilink = column_map.get("uilink") or pick_first_existing(
-        tmp, "UiLink", "UIlink", "Ui URL"
+        df, "UiLink", "UIlink", "Ui URL", cols=cols
     )
 
-    final = pd.DataFrame()
-
-    if sol_num in tmp.columns:
-        final["Solicitation Number"] = tmp[sol_num]
-
-    if title in tmp.columns:
-        final["Title"] = tmp[title]
-
-    if agency in tmp.columns:
-        final["Agency"] = tmp[agency]
-
-    if sol_date in tmp.columns:
-        final["Solicitation Date"] = force_date(tmp[sol_date])
-
-    if due_date in tmp.columns:
-        final["Due Date"] = force_date(tmp[due_date])
-
-    if "Normalized_Opportunity_Type" in tmp.columns:
-        final["Opportunity Type"] = tmp["Normalized_Opportunity_Type"]
-
-    if "Normalized_Set_Aside" in tmp.columns:
-        final["Normalized Set Aside"] = tmp["Normalized_Set_Aside"]
-
-    if uilink in tmp.columns:
-        final["UiLink"] = tmp[uilink]
-
-    # Sorting
+    # Output column -> source column, in output order
+    wanted = [
+        ("Solicitation Number", sol_num),
+        ("Title", title),
+        ("Agency", agency),
+        ("Solicitation Date", sol_date),
+        ("Due Date", due_date),
+        ("Opportunity Type", "Normalized_Opportunity_Type"),
+        ("Normalized Set Aside", "Normalized_Set_Aside"),
+        ("UiLink", uilink),
+    ]
+    wanted = [(out, src) for out, src in wanted if src in cols]
+
+    # One gather of the surviving rows and needed columns. Columns are
+    # relabelled positionally so a source column may feed two outputs.
+    srcs = [src for _, src in wanted]
+    final = df.loc[:, srcs] if mask is None else df.loc[mask, srcs]
+    final.columns = [out for out, _ in wanted]
+
+    date_cols = [c for c in ("Solicitation Date", "Due Date") if c in final.columns]
+    if len(date_cols) > 1 and len(final) > PARALLEL_MIN_ROWS:
+        with ThreadPoolExecutor(max_workers=len(date_cols)) as ex:
+            parsed = list(ex.map(force_date, [final[c] for c in date_cols]))
+    else:
+        parsed = [force_date(final[c]) for c in date_cols]
+    for col, values in zip(date_cols, parsed):
+        final[col] = values
+
+    # Agencies repeat heavily; codes make equals/in filters integer compares
+    if "Agency" in final.columns and not isinstance(final["Agency"].dtype, pd.CategoricalDtype):
+        final["Agency"] = final["Agency"].astype("category")
+
+    # Sorting (ordered categorical sorts on its integer codes); the key
+    # only builds a temporary ordering, the column itself is untouched
     if "Opportunity Type" in final.columns:
-        cat = pd.Categorical(
-            final["Opportunity Type"],
-            categories=["Solicitation", "Presolicitation", "Sources Sought", "Other"],
-            ordered=True,
-        )
-        final["_ord"] = cat
+        by = ["Opportunity Type"]
         if "Solicitation Date" in final.columns:
-            final = final.sort_values(["_ord", "Solicitation Date"])
-        else:
-            final = final.sort_values(["_ord"])
-        final = final.drop(columns=["_ord"])
+            by.append("Solicitation Date")
+        final = final.sort_values(
+            by,
+            key=lambda s: _opp_type_sort_key(s) if s.name == "Opportunity Type" else s,
+            kind="mergesort",
+        )
 
     return final
 
@@ -243,132 +532,226 @@ def build_final_output_table(df: pd.DataFrame, column_map: Dict, drop_no_set_asi
 # -------------------------------------------------
 # FILTERS (ALL date math done here)
 # -------------------------------------------------
+_LAGOS_TZ = ZoneInfo("Africa/Lagos")
+
+
 def lagos_today():
-    return datetime.now(pytz.timezone("Africa/Lagos")).date()
+    return datetime.now(_LAGOS_TZ).date()
 
 
-def get_last_week_range():
-    today = lagos_today()
+def _day(d) -> pd.Timestamp:
+    # Filter bounds as Timestamps so date columns compare natively
+    return pd.Timestamp(d)
+
+
+def get_last_week_range(today=None):
+    today = today or lagos_today()
     monday_this = today - timedelta(days=today.weekday())
     monday_last = monday_this - timedelta(days=7)
     return monday_last, monday_last + timedelta(days=6)
 
 
-def get_this_week_range():
-    today = lagos_today()
+def get_this_week_range(today=None):
+    today = today or lagos_today()
     monday = today - timedelta(days=today.weekday())
     return monday, monday + timedelta(days=6)
 
 
-def apply_filters(df: pd.DataFrame, filters: List[Dict]) -> pd.DataFrame:
-    if not filters:
-        return df
+# Each operator maps (column, value, today) to a boolean row mask, or
+# None to skip the filter. today is the Lagos date for the whole call.
+def _op_in(s, val, today):
+    return s.isin(val)
 
-    out = df.copy()
 
-    for f in filters:
-        col = f.get("column")
-        op = f.get("operator")
-        val = f.get("value")
+def _op_equals(s, val, today):
+    # Categoricals compare one integer code instead of every string
+    if isinstance(s.dtype, pd.CategoricalDtype) and pd.api.types.is_hashable(val):
+        if val not in s.cat.categories:
+            return pd.Series(False, index=s.index)
+        return s.cat.codes == s.cat.categories.get_loc(val)
+    return s == val
 
-        if not col or col not in out.columns:
-            continue
 
-        # Always normalize date fields
-        if col in ["Due Date", "Solicitation Date"]:
-            out[col] = force_date(out[col])
+def _op_contains(s, val, today):
+    return _arrow_strings(s).str.contains(str(val), case=False, regex=False, na=False)
 
-        # ---- IN ----
-        if op == "in":
-            out = out[out[col].isin(val)]
-            continue
 
-        # ---- EQUALS ----
-        if op == "equals":
-            out = out[out[col] == val]
-            continue
+def _op_between(s, val, today):
+    try:
+        d1 = _to_day(pd.to_datetime(val[0], errors="coerce"))
+        d2 = _to_day(pd.to_datetime(val[1], errors="coerce"))
+    except:
+        return None
+    return (s >= d1) & (s <= d2)
 
-        # ---- CONTAINS ----
-        if op == "contains":
-            s = out[col].astype(str)
-            out = out[s.str.contains(str(val), case=False, na=False)]
-            continue
 
-        # ---- BETWEEN ----
-        if op == "between":
-            try:
-                d1 = pd.to_datetime(val[0], errors="coerce").date()
-                d2 = pd.to_datetime(val[1], errors="coerce").date()
-            except:
-                continue
-            out = out.dropna(subset=[col])
-            out = out[(out[col] >= d1) & (out[col] <= d2)]
-            continue
+def _op_next_days(s, val, today):
+    start = _day(today)
+    return (s >= start) & (s <= start + timedelta(days=int(val)))
 
-        # ---- next_days ----
-        if op == "next_days":
-            today = lagos_today()
-            future = today + timedelta(days=int(val))
-            out = out.dropna(subset=[col])
-            out = out[(out[col] >= today) & (out[col] <= future)]
-            continue
 
-        # ---- today ----
-        if op == "today":
-            t = lagos_today()
-            out = out.dropna(subset=[col])
-            out = out[out[col] == t]
-            continue
+def _op_today(s, val, today):
+    return s == _day(today)
 
-        # ---- tomorrow ----
-        if op == "tomorrow":
-            t = lagos_today() + timedelta(days=1)
-            out = out.dropna(subset=[col])
-            out = out[out[col] == t]
-            continue
 
-        # ---- yesterday ----
-        if op == "yesterday":
-            t = lagos_today() - timedelta(days=1)
-            out = out.dropna(subset=[col])
-            out = out[out[col] == t]
-            continue
+def _op_tomorrow(s, val, today):
+    return s == _day(today + timedelta(days=1))
 
-        # ---- this_week ----
-        if op == "this_week":
-            start, end = get_this_week_range()
-            out = out.dropna(subset=[col])
-            out = out[(out[col] >= start) & (out[col] <= end)]
-            continue
 
-        # ---- last_week ----
-        if op == "last_week":
-            start, end = get_last_week_range()
-            out = out.dropna(subset=[col])
-            out = out[(out[col] >= start) & (out[col] <= end)]
-            continue
+def _op_yesterday(s, val, today):
+    return s == _day(today - timedelta(days=1))
 
-        # ---- last_7_days ----
-        if op == "last_7_days":
-            today = lagos_today()
-            start = today - timedelta(days=7)
-            out = out.dropna(subset=[col])
-            out = out[(out[col] >= start) & (out[col] <= today)]
+
+def _op_this_week(s, val, today):
+    start, end = map(_day, get_this_week_range(today))
+    return (s >= start) & (s <= end)
+
+
+def _op_last_week(s, val, today):
+    start, end = map(_day, get_last_week_range(today))
+    return (s >= start) & (s <= end)
+
+
+def _op_last_7_days(s, val, today):
+    end = _day(today)
+    return (s >= end - timedelta(days=7)) & (s <= end)
+
+
+_OPS = {
+    "in": _op_in,
+    "equals": _op_equals,
+    "contains": _op_contains,
+    "between": _op_between,
+    "next_days": _op_next_days,
+    "today": _op_today,
+    "tomorrow": _op_tomorrow,
+    "yesterday": _op_yesterday,
+    "this_week": _op_this_week,
+    "last_week": _op_last_week,
+    "last_7_days": _op_last_7_days,
+}
+
+
+def apply_filters(df: pd.DataFrame, filters: List[Dict]) -> pd.DataFrame:
+    if not filters:
+        return df
+
+    # Normalize the date fields some filter actually uses, once, up front;
+    # columns that are already datetime64 (build_final_output_table
+    # output) are left alone
+    used = {f.get("column") for f in filters}
+    out = df
+    for col in ["Due Date", "Solicitation Date"]:
+        if col in used and col in out.columns and not pd.api.types.is_datetime64_any_dtype(out[col]):
+            if out is df:
+                out = df.copy(deep=False)
+            out[col] = force_date(out[col])
+
+    # Every filter ANDs into one row mask; the frame is sliced once at the
+    # end. NaT/NA never match, which replaces the old per-filter dropna.
+    mask = np.ones(len(out), dtype=bool)
+
+    # One clock read per call; every relative-date operator shares it
+    today = lagos_today()
+
+    for f in filters:
+        col = f.get("column")
+        fn = _OPS.get(f.get("operator"))
+
+        if fn is None or not col or col not in out.columns:
             continue
 
-    return out
+        m = fn(out[col], f.get("value"), today)
+        if m is not None:
+            mask &= m.to_numpy(dtype=bool, na_value=False)
+
+    return out[mask]
 
 
 # -------------------------------------------------
 # EXPORTS
 # -------------------------------------------------
+def _excel_cell(val):
+    if not pd.api.types.is_scalar(val):
+        return str(val)
+    if pd.isna(val):
+        return None
+    return val
+
+
+def write_excel(df: pd.DataFrame, fileobj, sheet_name="Filtered") -> None:
+    """
+    Stream rows through xlsxwriter in constant_memory mode into fileobj
+    (a path or binary file handle), so large exports can go straight to
+    disk. pandas' to_excel writes column by column, which constant_memory
+    cannot handle, so rows are written here directly.
+    """
+    if xlsxwriter is None:
+        with pd.ExcelWriter(fileobj, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name[:31])
+        return
+
+    workbook = xlsxwriter.Workbook(fileobj, {
+        "constant_memory": True,
+        "strings_to_urls": False,
+        "remove_timezone": True,
+        "default_date_format": "yyyy-mm-dd",
+    })
+    sheet = workbook.add_worksheet(sheet_name[:31])
+
+    sheet.write_row(0, 0, [str(c) for c in df.columns])
+    for r, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        for c, val in enumerate(row):
+            val = _excel_cell(val)
+            if val is not None:
+                sheet.write(r, c, val)
+
+    workbook.close()
+
+
 def to_excel_bytes(df: pd.DataFrame, sheet_name="Filtered") -> bytes:
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name[:31])
-    buf.seek(0)
+    write_excel(df, buf, sheet_name)
     return buf.getvalue()
 
 
+def _to_csv_arrow(df: pd.DataFrame, buf) -> None:
+    """
+    Multi-threaded pyarrow CSV writer, encoding straight into buf.
+    Midnight-only timestamp columns are written as plain dates, the way
+    to_csv prints normalized date columns.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type) and field.type.tz is None:
+            col = table.column(i)
+            if pc.all(pc.equal(pc.floor_temporal(col, unit="day"), col)).as_py() is not False:
+                table = table.set_column(i, field.name, col.cast(pa.date32()))
+
+    # Unquoted like to_csv; a value that needs quotes raises ArrowInvalid
+    # and the caller falls back to to_csv's minimal quoting
+    header = io.StringIO()
+    csv.writer(header, lineterminator="\n").writerow(table.column_names)
+    buf.write(header.getvalue().encode("utf-8"))
+    pacsv.write_csv(table, buf, pacsv.WriteOptions(include_header=False, quoting_style="none"))
+
+
+# pyarrow missing, a mixed object/category column it can't convert, or a
+# value that needs quoting
+_CSV_ARROW_ERRORS = (ImportError, TypeError, ValueError) + (
+    (pa.ArrowNotImplementedError, pa.ArrowInvalid) if pa is not None else ()
+)
+
+
 def to_csv_bytes(df: pd.DataFrame) -> bytes:
-    return df.to_csv(index=False).encode("utf-8")
+    buf = io.BytesIO()
+    try:
+        _to_csv_arrow(df, buf)
+    except _CSV_ARROW_ERRORS:
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
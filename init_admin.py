@@ -1,5 +1,4 @@
 import json
-import hashlib
 import os
 import requests
 from pathlib import Path
@@ -8,9 +7,17 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-def hash_password(password: str) -> str:
-    """Hash a password using SHA256"""
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+# After load_dotenv so auth picks up the ARGON2_* / AUTH_SECRET settings
+from auth import hash_password
+
+# Streamlit re-runs app.py on every interaction; check once per process
+_CHECKED = False
+
+# Last Gist response (ETag + users) for conditional GETs
+GIST_CACHE = Path('.users.cache.json')
+
+_session = requests.Session()
+_session.headers.update({'Accept': 'application/vnd.github.v3+json'})
 
 def get_gist_config():
     """Get GitHub Gist configuration from environment variables"""
@@ -30,16 +37,26 @@ def check_gist_exists():
         return False, []
     
     try:
-        headers = {
-            'Authorization': f"token {config['github_token']}",
-            'Accept': 'application/vnd.github.v3+json'
-        }
-        response = requests.get(config['gist_url'], headers=headers, timeout=5)
-        
+        cached = json.loads(GIST_CACHE.read_text()) if GIST_CACHE.exists() else {}
+    except Exception:
+        cached = {}
+
+    try:
+        headers = {'Authorization': f"token {config['github_token']}"}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        response = _session.get(config['gist_url'], headers=headers, timeout=5)
+
+        # Unchanged since the last fetch: no body to download or parse
+        if response.status_code == 304:
+            return True, cached.get('users', [])
+
         if response.status_code == 200:
             gist_data = response.json()
             users_content = gist_data['files']['users.json']['content']
             users = json.loads(users_content)
+            if response.headers.get('ETag'):
+                GIST_CACHE.write_text(json.dumps({'etag': response.headers['ETag'], 'users': users}))
             return True, users
     except Exception as e:
         print(f"Could not check Gist: {e}")
@@ -48,7 +65,11 @@ def check_gist_exists():
 
 def create_default_admin():
     """Create default admin user if not exists"""
-    
+    global _CHECKED
+    if _CHECKED:
+        return
+    _CHECKED = True
+
     # Check if users already exist in Gist
     gist_exists, existing_users = check_gist_exists()
     
@@ -95,10 +116,7 @@ def create_default_admin():
     config = get_gist_config()
     if config['gist_id'] and config['github_token']:
         try:
-            headers = {
-                'Authorization': f"token {config['github_token']}",
-                'Accept': 'application/vnd.github.v3+json'
-            }
+            headers = {'Authorization': f"token {config['github_token']}"}
             
             data = {
                 'files': {
@@ -108,7 +126,7 @@ def create_default_admin():
                 }
             }
             
-            response = requests.patch(config['gist_url'], headers=headers, json=data, timeout=5)
+            response = _session.patch(config['gist_url'], headers=headers, json=data, timeout=5)
             if response.status_code == 200:
                 print(f"✓ Default admin created in GitHub Gist: {admin_username}")
             else:
@@ -1,209 +1,1327 @@
 import os
+import re
 import json
-from typing import Dict, Any
+import asyncio
+import atexit
+import copy
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime
-import pytz
+from functools import lru_cache
+import numpy as np
+from zoneinfo import ZoneInfo
 
+try:
+    import orjson
+except ImportError:  # stdlib json for payloads and replies
+    orjson = None
+
+try:
+    import fastjsonschema
+except ImportError:  # plans are filled with setdefault instead
+    fastjsonschema = None
+
+try:
+    import xxhash
+except ImportError:  # sha256 cache keys
+    xxhash = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = True
+except ImportError:  # HTTP/1.1 keep-alive only
+    HTTP2 = False
+
+try:
+    import httpx_aiohttp  # noqa: F401  (openai[aiohttp] transport)
+    AIOHTTP = True
+except ImportError:  # async calls use httpx's own transport
+    AIOHTTP = False
+
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+if AIOHTTP:
+    from openai import DefaultAioHttpClient
+
+_LAGOS_TZ = ZoneInfo("Africa/Lagos")
+
+# Free-text summaries go to a smaller, faster tier; plans keep the model
+# that follows the JSON schema reliably
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4.1-nano")
+PLAN_MODEL = os.getenv("PLAN_MODEL", "gpt-4.1-mini")
+
+# Short single-condition instructions are planned on the smaller tier
+PLAN_FAST_MODEL = os.getenv("PLAN_FAST_MODEL", "gpt-4.1-nano")
+FAST_PLAN_MAX_CHARS = 80
+# Keyword-only instructions are planned in Python without a model call
+RULE_BASED_PLANS = os.getenv("LLM_RULE_PLANS", "1") != "0"
 
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+_COMPLEX_WORDS = frozenset((
+    "and", "or", "not", "except", "without", "between", "unless",
+    "but", "either", "neither", "excluding", "only",
+))
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY missing")
+# Output ceilings bound decode time; a batch gets PLAN_MAX_TOKENS per request.
+# A typical plan is under 300 tokens.
+SUMMARY_MAX_TOKENS = 250
+PLAN_MAX_TOKENS = 600
+PLAN_TOP_P = 0.1
 
+# One pool per client, shared by every call in the process; with HTTP/2
+# back-to-back calls multiplex over a single TLS connection
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "20"))
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Transient failures (429, 5xx, timeouts, dropped connections) are retried
+# by the OpenAI client itself, with jittered exponential backoff that also
+# honours Retry-After; this is the number of retries after the first try
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+
+# Fan-out over many datasets: requests in flight, and the client's own
+# exponential-backoff retries (429s included) per request
+FANOUT_CONCURRENCY = 20
+FANOUT_MAX_RETRIES = 5
+
+# Deterministic (temperature 0) responses are cached on disk, keyed by request
+CACHE_PATH = Path(__file__).resolve().parent / ".cache" / "llm.sqlite"
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "1800"))
+
+_cache_conn = None
+_cache_lock = threading.Lock()
+
+# In-process tier in front of it (also holds non-deterministic replies,
+# so a rerun shows the same summary): key -> (expires, content)
+MEMO_MAX_ENTRIES = 512
+_memo: "OrderedDict[str, tuple]" = OrderedDict()
+
+# Plans are also reused for paraphrased requests over the same schema
+# (column names + dtypes) when the request embeddings are this close
+# (cosine) and the numbers / date words match exactly; set above 1 to
+# disable. Kept in the same SQLite file with the same TTL; least recently
+# used entries go first.
+SEMANTIC_THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.95"))
+SEMANTIC_MAX_ENTRIES = 1000
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 
 # -------------------------------------------------
-# Human-friendly summary
+# Prompts (built once at import)
 # -------------------------------------------------
-def summarize_dataset(eda: Dict) -> str:
-    prompt = (
-        "You are a concise analyst for federal opportunities.\n"
-        f"Dataset structure:\n{eda}\n\n"
-        "Explain briefly the content and main fields."
+SUMMARY_SYSTEM_PROMPT = "Be concise and clear."
+
+# The dataset goes last so the instruction text stays a stable prefix
+SUMMARY_PROMPT_TEMPLATE = (
+    "You are a concise analyst for federal opportunities.\n"
+    "Explain briefly the content and main fields.\n\n"
+    "Dataset structure:\n{eda}"
+)
+
+# Instruction text is identical on every call and sent ahead of the
+# per-request payload, so the provider can reuse it as a cached prefix.
+# Kept terse; column names, operators and set-aside values are verbatim.
+PLAN_SYSTEM_PROMPT = "You output ONLY valid JSON. Never write explanations outside JSON."
+
+PLAN_INSTRUCTIONS = """
+Map dataset columns and turn the request into filters. Python does all date
+math: never compute dates, only pick operators. The payload gives
+"current_date_lagos" for choosing them.
+
+columns (raw dataset column names):
+solicitation_number, title, agency, solicitation_date, due_date,
+opportunity_type_column, set_aside_column, uilink
+- solicitation_date only from "PostedDate", "NoticeDate", "SolicitationDate"
+- due_date only from "ResponseDeadLine", "ResponseDate", "DueDate"
+- never map "ArchiveDate", "AwardDate", "Active", "ArchiveType", "NaicsCodes" or any non-date column to a date
+
+filters[].column (final names only):
+"Solicitation Number", "Title", "Agency", "Solicitation Date", "Due Date",
+"Opportunity Type", "Normalized Set Aside", "UiLink"
+
+filters[].operator / value:
+- "equals", "contains": string
+- "in": list of strings
+- "between": ["YYYY-MM-DD", "YYYY-MM-DD"], explicit dates only
+- "next_days": int
+- "today", "tomorrow", "yesterday", "this_week", "last_week", "last_7_days": no value
+
+Set-asides: {"column": "Normalized Set Aside", "operator": "in", "value": [...]}
+with exact values only, no groupings:
+"SDVOSB", "WOSB", "TOTAL SMALL BUSINESS SET ASIDE",
+"VETERAN OWNED SMALL BUSINESS (VOSB)",
+"SBA Certified Economically Disadvantaged WOSB (EDWOSB) Program Set-Aside (FAR 19.15)",
+"NO SET-ASIDE"
+
+One filter per condition. "SDVOSB due in next 14 days" →
+[{"column": "Normalized Set Aside", "operator": "in", "value": ["SDVOSB"]},
+ {"column": "Due Date", "operator": "next_days", "value": 14}]
+Use null as the value for operators that take none.
+plan_explanation: one short sentence.
+"""
+
+
+# Operators apply_filters understands; anything else is rejected
+FILTER_OPERATORS = (
+    "equals", "in", "contains", "between", "next_days", "today",
+    "tomorrow", "yesterday", "this_week", "last_week", "last_7_days",
+)
+
+# Every key a plan can carry, with its empty value
+PLAN_COLUMN_KEYS = (
+    "solicitation_number", "title", "agency", "solicitation_date",
+    "due_date", "opportunity_type_column", "set_aside_column", "uilink",
+)
+
+_EMPTY_PLAN_TEMPLATE = {
+    "columns": {k: "" for k in PLAN_COLUMN_KEYS},
+    "set_aside_patterns": {},
+    "opportunity_type_patterns": {},
+    "filters": [],
+    "plan_explanation": "",
+}
+
+# Shape of a plan; missing keys take their value from the template
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "columns": {
+            "type": "object",
+            "properties": {k: {"default": ""} for k in PLAN_COLUMN_KEYS},
+            "default": _EMPTY_PLAN_TEMPLATE["columns"],
+        },
+        "set_aside_patterns": {"type": "object", "default": {}},
+        "opportunity_type_patterns": {"type": "object", "default": {}},
+        # Entries are checked one by one in _dedupe_filters
+        "filters": {"type": "array", "default": []},
+        "plan_explanation": {"type": "string", "default": ""},
+    },
+}
+
+_validate_plan = fastjsonschema.compile(PLAN_SCHEMA) if fastjsonschema else None
+
+# Final column names a filter may target
+FILTER_COLUMNS = (
+    "Solicitation Number", "Title", "Agency", "Solicitation Date", "Due Date",
+    "Opportunity Type", "Normalized Set Aside", "UiLink",
+)
+
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Structured Outputs wants every key required and nothing extra"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+# Plan shape enforced server-side (response_format json_schema). The
+# set-aside / opportunity-type vocabularies are closed, so their patterns
+# are data_engine's built-in tables and the model is not asked for them.
+PLAN_RESPONSE_SCHEMA = _strict_object({
+    "columns": _strict_object({k: {"type": "string"} for k in PLAN_COLUMN_KEYS}),
+    "filters": {
+        "type": "array",
+        "items": _strict_object({
+            "column": {"type": "string", "enum": list(FILTER_COLUMNS)},
+            "operator": {"type": "string", "enum": list(FILTER_OPERATORS)},
+            "value": {"anyOf": [
+                {"type": "string"},
+                {"type": "integer"},
+                {"type": "array", "items": {"type": "string"}},
+                {"type": "null"},
+            ]},
+        }),
+    },
+    "plan_explanation": {"type": "string"},
+})
+
+
+def _response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": schema},
+    }
+
+
+PLAN_FORMAT = _response_format("plan", PLAN_RESPONSE_SCHEMA)
+
+PLAN_BATCH_FORMAT = _response_format("plans", _strict_object({
+    "plans": {
+        "type": "array",
+        "items": _strict_object({
+            "id": {"type": "integer"},
+            **PLAN_RESPONSE_SCHEMA["properties"],
+        }),
+    },
+}))
+
+COMBINED_FORMAT = _response_format("summary_and_plan", _strict_object({
+    "summary": {"type": "string"},
+    "plan": PLAN_RESPONSE_SCHEMA,
+}))
+
+# Several instructions over the same dataset in one call
+PLAN_BATCH_SIZE = 8
+
+PLAN_BATCH_INSTRUCTIONS = """
+The payload has a "requests" list of {"id", "text"} instead of a single
+"user_request". Build one plan per request, exactly as above, under "plans".
+Every request id must appear exactly once.
+"""
+
+# Summary and plan in one reply (summarize_and_plan)
+COMBINED_INSTRUCTIONS = """
+Also write a short summary of the dataset for a federal-opportunities
+analyst: what it contains and its main fields. Put it under "summary" and
+the plan under "plan".
+"""
+
+
+# -------------------------------------------------
+# JSON
+# -------------------------------------------------
+def _dumps(obj, sort_keys: bool = False) -> str:
+    if orjson is not None:
+        opts = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            opts |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=str, option=opts).decode("utf-8")
+    return json.dumps(obj, sort_keys=sort_keys, default=str)
+
+
+def _loads(s):
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
+
+# -------------------------------------------------
+# Clients (built on first use, not at import)
+# -------------------------------------------------
+@lru_cache(maxsize=1)
+def _api_key() -> str:
+    load_dotenv()
+    key = os.getenv("OPENAI_API_KEY")
+    if not key:
+        raise ValueError("OPENAI_API_KEY missing")
+    return key
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> OpenAI:
+    http = DefaultHttpxClient(http2=HTTP2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    atexit.register(http.close)
+    return OpenAI(api_key=_api_key(), http_client=http, max_retries=MAX_RETRIES)
+
+
+def _async_http():
+    # aiohttp holds up under many concurrent requests where httpx's async
+    # pool degrades; it has no HTTP/2, so that flag only applies to httpx
+    if AIOHTTP:
+        return DefaultAioHttpClient(timeout=HTTP_TIMEOUT)
+    return DefaultAsyncHttpxClient(http2=HTTP2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+def _loop_client(max_retries: int = MAX_RETRIES) -> AsyncOpenAI:
+    """
+    Fresh async client for one event loop; use as `async with`. There is
+    no process-wide async client because its pool is bound to one loop.
+    """
+    http = _async_http()
+    return AsyncOpenAI(api_key=_api_key(), http_client=http, max_retries=max_retries)
+
+
+# -------------------------------------------------
+# Response cache
+# -------------------------------------------------
+def _get_cache():
+    global _cache_conn
+    with _cache_lock:
+        if _cache_conn is None:
+            CACHE_PATH.parent.mkdir(exist_ok=True)
+            conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, content TEXT NOT NULL, expires REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS plans "
+                    "(id INTEGER PRIMARY KEY, schema TEXT NOT NULL, anchors TEXT NOT NULL, "
+                    "vec BLOB NOT NULL, content TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_lookup ON plans(schema, anchors)")
+            _cache_conn = conn
+        return _cache_conn
+
+
+def _digest(text: str) -> str:
+    """Non-cryptographic key: xxh3-128 when available, else sha256"""
+    data = text.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_key(model: str, messages, **kw) -> str:
+    """Digest of the full request"""
+    return _digest(_dumps({"m": model, "msgs": messages, **kw}, sort_keys=True))
+
+
+def _cache_get(key: str, disk: bool = True):
+    """
+    In-process LRU first, then (for deterministic requests only) the
+    SQLite store; disk hits are promoted into memory.
+    """
+    now = time.time()
+    with _cache_lock:
+        hit = _memo.get(key)
+        if hit is not None and hit[0] > now:
+            _memo.move_to_end(key)
+            return hit[1]
+    if not disk:
+        return None
+
+    conn = _get_cache()
+    with _cache_lock:
+        row = conn.execute(
+            "SELECT content, expires FROM responses WHERE key = ? AND expires > ?",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        _memo_put(key, row[0], row[1])
+    return row[0]
+
+
+def _memo_put(key: str, content: str, expires: float):
+    # Caller holds _cache_lock
+    _memo[key] = (expires, content)
+    _memo.move_to_end(key)
+    while len(_memo) > MEMO_MAX_ENTRIES:
+        _memo.popitem(last=False)
+
+
+def _cache_put(key: str, content, disk: bool = True):
+    if content is None:
+        return
+    expires = time.time() + CACHE_TTL
+    with _cache_lock:
+        _memo_put(key, content, expires)
+    if not disk:
+        return
+    conn = _get_cache()
+    with _cache_lock, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+            (key, content, expires),
+        )
+
+
+def _reply_content(r) -> str:
+    choice = r.choices[0]
+    if choice.finish_reason == "length":
+        # Hit max_tokens; a truncated plan will not parse
+        used = r.usage.completion_tokens if r.usage else "?"
+        print(f"✗ {r.model} reply truncated at {used} completion tokens")
+    return choice.message.content
+
+
+class _JsonEnd:
+    """
+    Finds where the top-level JSON object of a streamed reply closes, one
+    delta at a time (braces inside string literals don't count).
+    """
+
+    def __init__(self):
+        self.depth, self.in_str, self.esc, self.started = 0, False, False, False
+
+    def feed(self, text: str) -> int:
+        """Index just past the closing brace in text, or -1"""
+        for i, ch in enumerate(text):
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return i + 1
+        return -1
+
+
+def _wants_json(kw) -> bool:
+    return (kw.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+
+
+def _read_json_stream(stream):
+    """(content, complete); stops reading once the object closes"""
+    parts, end = [], _JsonEnd()
+    for chunk in stream:
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        if not text:
+            continue
+        cut = end.feed(text)
+        if cut >= 0:
+            parts.append(text[:cut])
+            stream.close()
+            return "".join(parts), True
+        parts.append(text)
+    return "".join(parts), False
+
+
+async def _aread_json_stream(stream):
+    parts, end = [], _JsonEnd()
+    async for chunk in stream:
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        if not text:
+            continue
+        cut = end.feed(text)
+        if cut >= 0:
+            parts.append(text[:cut])
+            await stream.close()
+            return "".join(parts), True
+        parts.append(text)
+    return "".join(parts), False
+
+
+def _call_cached(model: str, messages, temperature: float, **kw) -> str:
+    """
+    chat.completions.create returning the message content. Every reply is
+    kept in memory; only temperature-0 replies also go to disk.
+    """
+    return _call_checked(model, messages, temperature, **kw)[0]
+
+
+def _call_checked(model: str, messages, temperature: float, **kw):
+    """_call_cached, as (content, complete); cut-off replies are not cached"""
+    key = _cache_key(model, messages, temperature=temperature, **kw)
+    disk = temperature <= 0
+    content = _cache_get(key, disk)
+    complete = True
+    if content is None:
+        if _wants_json(kw):
+            # JSON replies are streamed and cut off as soon as the object
+            # closes, instead of waiting out trailing whitespace
+            stream = _get_client().chat.completions.create(
+                model=model, messages=messages, temperature=temperature, stream=True, **kw
+            )
+            content, complete = _read_json_stream(stream)
+            if not complete:
+                print(f"✗ {model} reply ended before its JSON object closed")
+        else:
+            r = _get_client().chat.completions.create(
+                model=model, messages=messages, temperature=temperature, **kw
+            )
+            content = _reply_content(r)
+            complete = r.choices[0].finish_reason != "length"
+        if complete:
+            _cache_put(key, content, disk)
+    return content, complete
+
+
+async def _acall_cached(aclient, model: str, messages, temperature: float, **kw) -> str:
+    """
+    Async twin of _call_cached sharing the same cache. Without an aclient,
+    a miss opens (and closes) a client for this call only: an async
+    client's connection pool belongs to the event loop it was first used on.
+    """
+    key = _cache_key(model, messages, temperature=temperature, **kw)
+    disk = temperature <= 0
+    content = _cache_get(key, disk)
+    if content is None:
+        if aclient is None:
+            async with _loop_client() as aclient:
+                content, complete = await _acreate(aclient, model, messages, temperature, **kw)
+        else:
+            content, complete = await _acreate(aclient, model, messages, temperature, **kw)
+        if complete:
+            _cache_put(key, content, disk)
+    return content
+
+
+async def _acreate(aclient, model: str, messages, temperature: float, **kw):
+    """(content, complete) of one uncached request"""
+    if _wants_json(kw):
+        stream = await aclient.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, stream=True, **kw
+        )
+        content, complete = await _aread_json_stream(stream)
+        if not complete:
+            print(f"✗ {model} reply ended before its JSON object closed")
+        return content, complete
+
+    r = await aclient.chat.completions.create(
+        model=model, messages=messages, temperature=temperature, **kw
     )
+    return _reply_content(r), r.choices[0].finish_reason != "length"
+
+
+# -------------------------------------------------
+# Semantic plan cache
+# -------------------------------------------------
+def _schema_hash(eda: Dict) -> str:
+    # Column names and dtypes only, so row counts and samples don't matter
+    fp = "|".join(f"{c.get('name')}:{c.get('dtype')}" for c in eda.get("columns", []))
+    return _digest(fp)
+
+
+def _embed(text: str) -> np.ndarray:
+    r = _get_client().embeddings.create(model=EMBEDDING_MODEL, input=[text])
+    v = np.asarray(r.data[0].embedding, dtype=np.float32)
+    return v / (np.linalg.norm(v) or 1.0)
+
+
+# Words that change a plan's dates, set-aside or sense while barely moving
+# the embedding ("today" vs "tomorrow", "next 7" vs "next 14 days",
+# "due today" vs "not due today")
+_ANCHOR_WORDS = _COMPLEX_WORDS | frozenset((
+    "no", "non", "nor", "other", "than", "exclude", "excludes", "isn",
+    "aren", "don", "doesn", "wasn", "weren",
+    "today", "tomorrow", "yesterday", "tonight", "this", "next", "last",
+    "past", "previous", "coming", "within", "ago", "before", "after", "since",
+    "until", "day", "days", "week", "weeks", "weekend", "month", "months",
+    "year", "years", "quarter", "monday", "tuesday", "wednesday", "thursday",
+    "friday", "saturday", "sunday", "january", "february", "march", "april",
+    "may", "june", "july", "august", "september", "october", "november",
+    "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec", "sdvosb", "vosb", "wosb", "edwosb",
+))
+
+
+def _request_anchors(text: str) -> str:
+    """Digits and date / set-aside words of a request, in order"""
+    words = re.findall(r"\d+|[a-z]+", text.lower())
+    return " ".join(w for w in words if w.isdigit() or w in _ANCHOR_WORDS)
+
+
+def _semantic_get(schema: str, anchors: str, vec: np.ndarray):
+    """Closest unexpired earlier request with the same schema and anchors"""
+    now = time.time()
+    conn = _get_cache()
+    with _cache_lock:
+        rows = conn.execute(
+            "SELECT id, vec, content FROM plans "
+            "WHERE schema = ? AND anchors = ? AND expires > ?",
+            (schema, anchors, now),
+        ).fetchall()
+    rows = [r for r in rows if len(r[1]) == vec.nbytes]
+    if not rows:
+        return None
+
+    vecs = np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float32).reshape(len(rows), -1)
+    sims = vecs @ vec
+    best = int(np.argmax(sims))
+    if sims[best] < SEMANTIC_THRESHOLD:
+        return None
+
+    with _cache_lock, conn:
+        conn.execute("UPDATE plans SET used = ? WHERE id = ?", (now, rows[best][0]))
+    return rows[best][2]
+
+
+def _semantic_put(schema: str, anchors: str, vec: np.ndarray, content: str):
+    now = time.time()
+    conn = _get_cache()
+    with _cache_lock, conn:
+        conn.execute(
+            "INSERT INTO plans (schema, anchors, vec, content, expires, used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (schema, anchors, vec.astype(np.float32).tobytes(), content, now + CACHE_TTL, now),
+        )
+        conn.execute("DELETE FROM plans WHERE expires <= ?", (now,))
+        conn.execute(
+            "DELETE FROM plans WHERE id NOT IN "
+            "(SELECT id FROM plans ORDER BY used DESC LIMIT ?)",
+            (SEMANTIC_MAX_ENTRIES,),
+        )
+
+
+# -------------------------------------------------
+# Prompt-size trimming
+# -------------------------------------------------
+# Columns whose names hint at one of the plan's mapped roles keep their
+# example values; the rest are sent as name/dtype/count only
+_ROLE_HINTS = (
+    "solicitation", "notice", "title", "agency", "department", "office",
+    "date", "deadline", "response", "posted", "type", "set", "aside",
+    "link", "url",
+)
+
+
+# For planning, only set-aside / opportunity-type columns need values to
+# tell them apart; every other role is chosen by name
+_PATTERN_HINTS = ("type", "set", "aside")
+
+
+def _compact_eda(eda: Dict, max_examples: int = 5, max_chars: int = 80,
+                 hints: tuple = _ROLE_HINTS) -> Dict:
+    """Copy of build_full_eda output with fewer, shorter example values"""
+    columns = []
+    for c in eda.get("columns", []):
+        c = dict(c)
+        c["dtype"] = str(c.get("dtype", ""))[:20]
+        name = str(c.get("name", "")).lower()
+        if any(h in name for h in hints):
+            c["example_values"] = [
+                str(v)[:max_chars] for v in c.get("example_values", [])[:max_examples]
+            ]
+        else:
+            c.pop("example_values", None)
+        columns.append(c)
+    return {**eda, "columns": columns}
+
+
+# Wide datasets are cut down to this many columns before planning
+PLAN_MAX_COLUMNS = 40
+
+
+def _name_words(name: str) -> set:
+    """Lowercase words of a column name: "ResponseDeadLine" -> response, dead, line"""
+    return {w.lower() for w in re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", name)}
+
 
-    r = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": "Be concise and clear."},
+def _rank_plan_columns(columns: List[Dict], text: str) -> List[Dict]:
+    """
+    At most PLAN_MAX_COLUMNS columns, in their original order. Columns whose
+    names hint at a plan role are always kept; the remaining slots go to
+    the columns sharing the most words with the instruction.
+    """
+    if len(columns) <= PLAN_MAX_COLUMNS:
+        return columns
+
+    asked = {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 2}
+    keep, scored = set(), []
+    for i, c in enumerate(columns):
+        name = str(c.get("name", ""))
+        words = _name_words(name)
+        if "id" in words or any(h in name.lower() for h in _ROLE_HINTS):
+            keep.add(i)
+        else:
+            score = sum(1 for w in asked if w in words or w in name.lower())
+            scored.append((-score, i))
+
+    for _, i in sorted(scored)[:max(PLAN_MAX_COLUMNS - len(keep), 0)]:
+        keep.add(i)
+
+    return [c for i, c in enumerate(columns) if i in keep]
+
+
+def _compact_eda_for_plan(eda: Dict, text: str = "") -> Dict:
+    """_compact_eda for planning; text is the instruction(s) to rank columns by"""
+    eda = _compact_eda(eda, hints=_PATTERN_HINTS)
+    return {**eda, "columns": _rank_plan_columns(eda["columns"], text)}
+
+
+# -------------------------------------------------
+# Human-friendly summary
+# -------------------------------------------------
+def _summary_request(eda: Dict) -> Dict[str, Any]:
+    prompt = SUMMARY_PROMPT_TEMPLATE.format(eda=_compact_eda(eda))
+
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
-        temperature=0.2,
-    )
+        "temperature": 0.2,
+        "max_tokens": SUMMARY_MAX_TOKENS,
+    }
 
-    return r.choices[0].message.content
+
+# Returned without a model call when there is nothing to look at
+NO_DATA_SUMMARY = "The dataset has no columns, so there is nothing to summarize."
+
+
+def _has_columns(eda) -> bool:
+    return bool(eda) and bool(eda.get("columns"))
+
+
+def summarize_dataset(eda: Dict) -> str:
+    if not _has_columns(eda):
+        return NO_DATA_SUMMARY
+    return _call_cached(**_summary_request(eda))
+
+
+async def asummarize_dataset(eda: Dict, aclient=None) -> str:
+    if not _has_columns(eda):
+        return NO_DATA_SUMMARY
+    return await _acall_cached(aclient, **_summary_request(eda))
+
+
+def stream_dataset_summary(eda: Dict) -> Iterator[str]:
+    """Summary text as it is generated, for st.write_stream"""
+    if not _has_columns(eda):
+        yield NO_DATA_SUMMARY
+        return
+    req = _summary_request(eda)
+    key = _cache_key(**req)
+    cached = _cache_get(key, disk=False)
+    if cached is not None:
+        yield cached
+        return
+
+    parts, finish = [], None
+    stream = _get_client().chat.completions.create(stream=True, **req)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish = choice.finish_reason or finish
+        if choice.delta.content:
+            parts.append(choice.delta.content)
+            yield parts[-1]
+    # A summary cut off at SUMMARY_MAX_TOKENS is shown but not reused
+    if finish == "stop":
+        _cache_put(key, "".join(parts), disk=False)
+
+
+# -------------------------------------------------
+# Rule-based plans (no model call)
+# -------------------------------------------------
+# Phrase -> Normalized Set Aside value; longer phrases are matched first
+_RULE_SET_ASIDES = (
+    ("economically disadvantaged", "SBA Certified Economically Disadvantaged WOSB (EDWOSB) Program Set-Aside (FAR 19.15)"),
+    ("edwosb", "SBA Certified Economically Disadvantaged WOSB (EDWOSB) Program Set-Aside (FAR 19.15)"),
+    ("service-disabled veteran-owned", "SDVOSB"),
+    ("service disabled veteran owned", "SDVOSB"),
+    ("service-disabled", "SDVOSB"),
+    ("service disabled", "SDVOSB"),
+    ("sdvosb", "SDVOSB"),
+    ("women-owned", "WOSB"),
+    ("women owned", "WOSB"),
+    ("wosb", "WOSB"),
+    ("veteran-owned", "VETERAN OWNED SMALL BUSINESS (VOSB)"),
+    ("veteran owned", "VETERAN OWNED SMALL BUSINESS (VOSB)"),
+    ("vosb", "VETERAN OWNED SMALL BUSINESS (VOSB)"),
+    ("total small business", "TOTAL SMALL BUSINESS SET ASIDE"),
+    ("no set-aside", "NO SET-ASIDE"),
+    ("no set aside", "NO SET-ASIDE"),
+    ("unrestricted", "NO SET-ASIDE"),
+)
+
+# Phrase -> Opportunity Type bucket (bare "solicitation" is too generic)
+_RULE_OPP_TYPES = (
+    ("combined synopsis", "Solicitation"),
+    ("pre-solicitation", "Presolicitation"),
+    ("presolicitation", "Presolicitation"),
+    ("sources sought", "Sources Sought"),
+    ("request for information", "Sources Sought"),
+    ("rfi", "Sources Sought"),
+)
+
+# Relative date phrases -> operator; "next N days" is handled separately
+_RULE_DATE_OPS = (
+    ("last 7 days", "last_7_days"),
+    ("past 7 days", "last_7_days"),
+    ("this week", "this_week"),
+    ("last week", "last_week"),
+    ("today", "today"),
+    ("tomorrow", "tomorrow"),
+    ("yesterday", "yesterday"),
+)
+_NEXT_DAYS_RE = re.compile(r"\b(?:(?:in )?(?:the )?next|within(?: the next)?) (\d{1,3}) days?\b")
+
+_DUE_WORDS = frozenset(("due", "deadline", "closing", "closes", "expiring", "expire", "expires"))
+_POSTED_WORDS = frozenset(("posted", "published", "released", "issued"))
+
+# Words that may surround the recognised phrases without changing them
+_FILLER_WORDS = frozenset((
+    "show", "me", "list", "find", "get", "give", "all", "the", "a", "an",
+    "any", "of", "for", "with", "that", "are", "is", "which", "in", "within",
+    "on", "by", "from", "please", "and", "only", "opportunities", "opportunity",
+    "solicitations", "solicitation", "contracts", "contract", "notices", "notice",
+    "set", "aside", "set-aside", "set-asides", "setaside", "type", "types",
+)) | _DUE_WORDS | _POSTED_WORDS
+
+# Source-column candidates, as build_final_output_table resolves them
+_RULE_COLUMNS = {
+    "solicitation_number": ("SolicitationNumber", "NoticeId", "NoticeID"),
+    "title": ("Title", "Description"),
+    "agency": ("Agency", "Office"),
+    "solicitation_date": ("PostedDate", "NoticeDate", "SolicitationDate"),
+    "due_date": ("ResponseDeadLine", "ResponseDate", "DueDate"),
+    "opportunity_type_column": ("Type", "BaseType"),
+    "set_aside_column": ("TypeOfSetAsideDescription", "SetASide", "TypeOfSetAside"),
+    "uilink": ("UiLink", "UIlink", "Ui URL"),
+}
+
+
+def _take(text: str, phrase: str):
+    """(found, text with the phrase blanked out), whole words only"""
+    pat = r"(?<![a-z0-9-])" + re.escape(phrase) + r"(?![a-z0-9-])"
+    new = re.sub(pat, " ", text)
+    return new != text, new
+
+
+def try_rule_based_plan(user_request: str, eda: Dict) -> Optional[Dict[str, Any]]:
+    """
+    Plan for instructions made only of set-aside, opportunity-type and
+    relative-date phrases over a dataset with the standard SAM.gov column
+    names. None when anything is left over or a needed column is missing,
+    in which case the model has to plan it.
+    """
+    text = " " + " ".join((user_request or "").lower().split()) + " "
+    words = set(re.findall(r"[a-z0-9-]+", text))
+
+    set_asides, opp_types = [], []
+    for phrase, value in _RULE_SET_ASIDES:
+        found, text = _take(text, phrase)
+        if found and value not in set_asides:
+            set_asides.append(value)
+    for phrase, value in _RULE_OPP_TYPES:
+        found, text = _take(text, phrase)
+        if found and value not in opp_types:
+            opp_types.append(value)
+
+    date_filters = []
+    m = _NEXT_DAYS_RE.search(text)
+    if m:
+        date_filters.append({"operator": "next_days", "value": int(m.group(1))})
+        text = text[:m.start()] + " " + text[m.end():]
+    for phrase, op in _RULE_DATE_OPS:
+        found, text = _take(text, phrase)
+        if found:
+            date_filters.append({"operator": op})
+
+    leftover = set(re.findall(r"[a-z0-9%-]+", text)) - _FILLER_WORDS
+    if leftover or len(date_filters) > 1 or not (set_asides or opp_types or date_filters):
+        return None
+
+    names = {c.get("name") for c in eda.get("columns", [])}
+    columns = {
+        role: next((c for c in cands if c in names), "")
+        for role, cands in _RULE_COLUMNS.items()
+    }
+
+    filters = []
+    if set_asides:
+        if not columns["set_aside_column"]:
+            return None
+        filters.append({"column": "Normalized Set Aside", "operator": "in", "value": set_asides})
+    if opp_types:
+        if not columns["opportunity_type_column"]:
+            return None
+        filters.append({"column": "Opportunity Type", "operator": "in", "value": opp_types})
+    if date_filters:
+        due, posted = bool(words & _DUE_WORDS), bool(words & _POSTED_WORDS)
+        if due == posted:
+            return None
+        col, role = ("Due Date", "due_date") if due else ("Solicitation Date", "solicitation_date")
+        if not columns[role]:
+            return None
+        filters.append({"column": col, **date_filters[0]})
+
+    return _fill_plan({
+        "columns": columns,
+        "filters": filters,
+        "plan_explanation": "Matched by keyword rules; no model call was needed.",
+    })
 
 
 # -------------------------------------------------
 # Create a deterministic plan
 # -------------------------------------------------
-def create_llm_plan(eda: Dict, user_request: str) -> Dict[str, Any]:
+def _lagos_today() -> str:
+    return datetime.now(_LAGOS_TZ).strftime("%Y-%m-%d")
 
-    lagos = pytz.timezone("Africa/Lagos")
-    current_date_lagos = datetime.now(lagos).strftime("%Y-%m-%d")
-
-    SYSTEM_PROMPT = f"""
-You output ONLY valid JSON. Never write explanations outside JSON.
-
-PYTHON performs all date math. DO NOT compute dates yourself.
-
-Use this Lagos reference date ONLY for choosing operators:
-    current_date_lagos = "{current_date_lagos}"
-
------------------------------------------------------
-VALID FINAL COLUMN NAMES (filters MUST use these):
------------------------------------------------------
-"Solicitation Number"
-"Title"
-"Agency"
-"Solicitation Date"
-"Due Date"
-"Opportunity Type"
-"Normalized Set Aside"
-"UiLink"
-
------------------------------------------------------
-VALID RAW COLUMN NAMES FOR MAPPING
------------------------------------------------------
-Solicitation Date can ONLY be mapped from:
-- "PostedDate"
-- "NoticeDate"
-- "SolicitationDate"
-
-Due Date can ONLY be mapped from:
-- "ResponseDeadLine"
-- "ResponseDate"
-- "DueDate"
-
-NEVER map:
-- "ArchiveDate"
-- "AwardDate"
-- "Active"
-- "ArchiveType"
-- "NaicsCodes"
-- or anything that is not clearly a date column.
-
------------------------------------------------------
-VALID FILTER OPERATORS
------------------------------------------------------
-No date math should be done by you.
-
-You MUST return operators:
-- "equals"
-- "in"
-- "contains"
-- "between" (explicit dates)
-- "next_days" (int)
-- "today"
-- "tomorrow"
-- "yesterday"
-- "this_week"
-- "last_week"
-- "last_7_days"
-
-EXAMPLES:
-
-"due tomorrow" → {"{"}"column": "Due Date", "operator": "tomorrow"{"}"}
-
-"due in next 14 days" → {"{"}"column": "Due Date", "operator": "next_days", "value": 14{"}"}
-
-"due last week" → {"{"}"column": "Due Date", "operator": "last_week"{"}"}
-
-"due between Feb 1 and Feb 5" →
-{{
-  "column": "Due Date",
-  "operator": "between",
-  "value": ["2024-02-01","2024-02-05"]
-}}
-
------------------------------------------------------
-SET-ASIDE FILTERING
------------------------------------------------------
-If user mentions a set-aside category, filter using:
-
-"column": "Normalized Set Aside"
-"operator": "in"
-"value": ["CATEGORY"]
-
-Valid categories:
-- "SDVOSB"
-- "WOSB"
-- "TOTAL SMALL BUSINESS SET ASIDE"
-- "VETERAN OWNED SMALL BUSINESS (VOSB)"
-- "SBA Certified Economically Disadvantaged WOSB (EDWOSB) Program Set-Aside (FAR 19.15)"
-- "NO SET-ASIDE"
-
-Do NOT create semantic groupings. Match ONLY explicit values.
-
------------------------------------------------------
-MULTIPLE FILTERS
------------------------------------------------------
-If request contains multiple conditions, list multiple filter objects.
-
-Example:
-"SDVOSB due in next 14 days" →
-"filters": [
-  {{"column": "Normalized Set Aside", "operator": "in", "value": ["SDVOSB"]}},
-  {{"column": "Due Date", "operator": "next_days", "value": 14}}
-]
-
------------------------------------------------------
-RETURN JSON ONLY
------------------------------------------------------
-Schema to follow:
-
-{{
-  "columns": {{
-    "solicitation_number": "",
-    "title": "",
-    "agency": "",
-    "solicitation_date": "",
-    "due_date": "",
-    "opportunity_type_column": "",
-    "set_aside_column": "",
-    "uilink": ""
-  }},
-  "set_aside_patterns": {{}},
-  "opportunity_type_patterns": {{}},
-  "filters": [],
-  "plan_explanation": ""
-}}
-"""
+
+def _pick_model(user_request: str) -> str:
+    """PLAN_FAST_MODEL for short instructions with no combining or negating words"""
+    text = user_request.strip().lower()
+    if len(text) >= FAST_PLAN_MAX_CHARS:
+        return PLAN_MODEL
+    if _COMPLEX_WORDS.intersection(re.findall(r"[a-z]+", text)) or "," in text:
+        return PLAN_MODEL
+    return PLAN_FAST_MODEL
+
+
+def _plan_request(eda: Dict, user_request: str) -> Dict[str, Any]:
+
+    current_date_lagos = _lagos_today()
 
     payload = {
-        "eda": eda,
-        "user_request": user_request,
+        "eda": _compact_eda_for_plan(eda, user_request),
+        "user_request": user_request.strip(),
         "current_date_lagos": current_date_lagos,
         "note": "Return operators only. Python does ALL date math.",
     }
 
-    r = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": json.dumps(payload)},
+    return {
+        "model": _pick_model(user_request),
+        "messages": [
+            {"role": "system", "content": PLAN_SYSTEM_PROMPT},
+            {"role": "user", "content": PLAN_INSTRUCTIONS},
+            {"role": "user", "content": _dumps(payload)},
         ],
-        temperature=0.0,
-    )
+        "temperature": 0.0,
+        "top_p": PLAN_TOP_P,
+        "max_tokens": PLAN_MAX_TOKENS,
+        "response_format": PLAN_FORMAT,
+    }
+
+
+def _plans_request(eda: Dict, user_requests: List[str]) -> Dict[str, Any]:
+    """Like _plan_request, but several instructions answered in one reply"""
+    current_date_lagos = _lagos_today()
+
+    payload = {
+        "eda": _compact_eda_for_plan(eda, " ".join(user_requests)),
+        "requests": [{"id": i, "text": r} for i, r in enumerate(user_requests)],
+        "current_date_lagos": current_date_lagos,
+        "note": "Return operators only. Python does ALL date math.",
+    }
+
+    return {
+        "model": PLAN_MODEL,
+        "messages": [
+            {"role": "system", "content": PLAN_SYSTEM_PROMPT},
+            {"role": "user", "content": PLAN_INSTRUCTIONS},
+            {"role": "user", "content": PLAN_BATCH_INSTRUCTIONS},
+            {"role": "user", "content": _dumps(payload)},
+        ],
+        "temperature": 0.0,
+        "top_p": PLAN_TOP_P,
+        "max_tokens": PLAN_MAX_TOKENS * len(user_requests),
+        "response_format": PLAN_BATCH_FORMAT,
+    }
 
-    content = r.choices[0].message.content
 
+def _parse_plan(content) -> Dict[str, Any]:
     try:
-        plan = json.loads(content)
+        plan = _loads(content)
     except Exception:
         plan = {}
 
-    # Ensure structure
-    plan.setdefault("columns", {})
-    plan.setdefault("set_aside_patterns", {})
-    plan.setdefault("opportunity_type_patterns", {})
-    plan.setdefault("filters", [])
-    plan.setdefault("plan_explanation", "")
+    return _fill_plan(plan)
+
 
+def _from_structured(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Undo the wire-only shapes of PLAN_RESPONSE_SCHEMA"""
+    # Left empty so normalize_columns uses only its built-in pattern tables
+    for key in ("set_aside_patterns", "opportunity_type_patterns"):
+        plan.pop(key, None)
+    for f in plan.get("filters") or []:
+        if isinstance(f, dict) and f.get("value", 0) is None:
+            del f["value"]
     return plan
+
+
+def _fill_plan(plan) -> Dict[str, Any]:
+    if not isinstance(plan, dict):
+        plan = {}
+    plan = _from_structured(plan)
+    # A top-level key of the wrong kind falls back to its default rather
+    # than replacing it (e.g. "columns": null) or sinking the whole plan
+    plan = {
+        k: v for k, v in plan.items()
+        if k not in _EMPTY_PLAN_TEMPLATE or isinstance(v, type(_EMPTY_PLAN_TEMPLATE[k]))
+    }
+
+    if _validate_plan is not None:
+        # Fills missing keys
+        try:
+            filled = _validate_plan(plan)
+        except fastjsonschema.JsonSchemaException as e:
+            print(f"✗ LLM plan rejected: {e}")
+            return _empty_plan()
+    else:
+        # Two-level merge over a fresh copy of the template
+        filled = _empty_plan()
+        for k, v in plan.items():
+            if isinstance(v, dict) and isinstance(filled.get(k), dict):
+                filled[k].update(v)
+            else:
+                filled[k] = v
+
+    filled["filters"] = _dedupe_filters(filled["filters"])
+    return filled
+
+
+_FILTER_OPERATOR_SET = frozenset(FILTER_OPERATORS)
+
+
+def _dedupe_filters(filters) -> List[Dict[str, Any]]:
+    """
+    Well-formed filters in order: a dict with a string column and a known
+    operator (value is optional). Bad entries and repeats are dropped on
+    their own, so one of them doesn't cost the rest of the plan.
+    """
+    seen, cleaned = set(), []
+    for f in filters if isinstance(filters, list) else []:
+        if not isinstance(f, dict) or not isinstance(f.get("column"), str):
+            continue
+        if f.get("operator") not in _FILTER_OPERATOR_SET:
+            continue
+        key = (f["column"], f["operator"], repr(f.get("value")))
+        if key not in seen:
+            seen.add(key)
+            cleaned.append(f)
+    return cleaned
+
+
+def _empty_plan() -> Dict[str, Any]:
+    return copy.deepcopy(_EMPTY_PLAN_TEMPLATE)
+
+
+def create_llm_plan(eda: Dict, user_request: str) -> Dict[str, Any]:
+    if not _has_columns(eda) or not (user_request or "").strip():
+        return _empty_plan()
+
+    plan = try_rule_based_plan(user_request, eda) if RULE_BASED_PLANS else None
+    if plan is not None:
+        return plan
+
+    # Exact repeats are answered before paying for an embedding
+    req = _plan_request(eda, user_request)
+    content = _cache_get(_cache_key(**req))
+    if content is not None:
+        return _parse_plan(content)
+
+    schema, anchors, vec = _schema_hash(eda), _request_anchors(user_request), None
+    if SEMANTIC_THRESHOLD <= 1:
+        try:
+            vec = _embed(user_request.strip())
+            cached = _semantic_get(schema, anchors, vec)
+            if cached is not None:
+                return _parse_plan(cached)
+        except Exception as e:
+            print(f"✗ Plan cache lookup failed: {e}")
+            vec = None
+
+    content, complete = _call_checked(**req)
+    plan = _parse_plan(content)
+    # Only whole replies that produced filters are offered to paraphrases
+    if vec is not None and complete and plan["filters"]:
+        _semantic_put(schema, anchors, vec, content)
+    return plan
+
+
+async def acreate_llm_plan(eda: Dict, user_request: str, aclient=None) -> Dict[str, Any]:
+    if not _has_columns(eda) or not (user_request or "").strip():
+        return _empty_plan()
+    plan = try_rule_based_plan(user_request, eda) if RULE_BASED_PLANS else None
+    if plan is not None:
+        return plan
+    content = await _acall_cached(aclient, **_plan_request(eda, user_request))
+    return _parse_plan(content)
+
+
+def create_llm_plans_batch(
+    eda: Dict, user_requests: List[str], batch_size: int = PLAN_BATCH_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    One plan per instruction, in order. Instructions are sent batch_size
+    at a time so the shared eda is paid for once per batch rather than
+    once per instruction; ids the model leaves out are planned on
+    their own with create_llm_plan.
+    Blank instructions (or an eda without columns) are not sent at all.
+    """
+    plans = [_empty_plan() for _ in user_requests]
+    if not _has_columns(eda):
+        return plans
+
+    live = []
+    for i, r in enumerate(user_requests):
+        if not (r and r.strip()):
+            continue
+        plan = try_rule_based_plan(r, eda) if RULE_BASED_PLANS else None
+        if plan is not None:
+            plans[i] = plan
+        else:
+            live.append(i)
+
+    for start in range(0, len(live), batch_size):
+        idx = live[start:start + batch_size]
+        chunk = [user_requests[i] for i in idx]
+        content = _call_cached(**_plans_request(eda, chunk))
+
+        try:
+            entries = _loads(content).get("plans", [])
+        except Exception:
+            entries = []
+
+        by_id = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, dict) and isinstance(entry.get("id"), int):
+                by_id[entry.pop("id")] = entry
+
+        for n, i in enumerate(idx):
+            if n in by_id:
+                plans[i] = _fill_plan(by_id[n])
+            else:
+                plans[i] = create_llm_plan(eda, user_requests[i])
+
+    return plans
+
+
+# -------------------------------------------------
+# Summary and plan together
+# -------------------------------------------------
+def _summary_plan_request(eda: Dict, user_request: str) -> Dict[str, Any]:
+    """The plan request, also asking for the summary in the same reply"""
+    req = _plan_request(eda, user_request)
+    req["messages"].insert(-1, {"role": "user", "content": COMBINED_INSTRUCTIONS})
+    req["max_tokens"] = PLAN_MAX_TOKENS + SUMMARY_MAX_TOKENS
+    req["response_format"] = COMBINED_FORMAT
+    return req
+
+
+def _split_summary_plan(content):
+    try:
+        obj = _loads(content)
+    except Exception:
+        obj = {}
+    if not isinstance(obj, dict):
+        obj = {}
+    return str(obj.get("summary") or ""), _fill_plan(obj.get("plan"))
+
+
+def summarize_and_plan(eda: Dict, user_request: str):
+    """
+    (summary, plan) from one chat call on the plan model, so the EDA is
+    sent and encoded once instead of twice.
+    """
+    if not _has_columns(eda):
+        return NO_DATA_SUMMARY, _empty_plan()
+    if not (user_request or "").strip():
+        return summarize_dataset(eda), _empty_plan()
+    plan = try_rule_based_plan(user_request, eda) if RULE_BASED_PLANS else None
+    if plan is not None:
+        return summarize_dataset(eda), plan
+    return _split_summary_plan(_call_cached(**_summary_plan_request(eda, user_request)))
+
+
+async def asummarize_and_plan(eda: Dict, user_request: str, aclient=None):
+    """Async twin of summarize_and_plan"""
+    if not _has_columns(eda):
+        return NO_DATA_SUMMARY, _empty_plan()
+    if not (user_request or "").strip():
+        return await asummarize_dataset(eda, aclient), _empty_plan()
+    plan = try_rule_based_plan(user_request, eda) if RULE_BASED_PLANS else None
+    if plan is not None:
+        return await asummarize_dataset(eda, aclient), plan
+    content = await _acall_cached(aclient, **_summary_plan_request(eda, user_request))
+    return _split_summary_plan(content)
+
+
+# -------------------------------------------------
+# Many datasets at once
+# -------------------------------------------------
+async def asummarize_many(edas: List[Dict], concurrency: int = FANOUT_CONCURRENCY, aclient=None) -> List[str]:
+    """
+    Summaries for several datasets, at most `concurrency` requests in
+    flight. A failed dataset yields "(AI failed: ...)" like the app shows.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(eda):
+        async with sem:
+            try:
+                return await asummarize_dataset(eda, aclient)
+            except Exception as e:
+                return f"(AI failed: {e})"
+
+    return list(await asyncio.gather(*(_one(e) for e in edas)))
+
+
+def summarize_many(edas: List[Dict], concurrency: int = FANOUT_CONCURRENCY) -> List[str]:
+    """Blocking wrapper for asummarize_many"""
+    async def _run():
+        async with _loop_client(max_retries=FANOUT_MAX_RETRIES) as aclient:
+            return await asummarize_many(edas, concurrency, aclient)
+
+    return asyncio.run(_run())
+
+
+# -------------------------------------------------
+# Offline plans (Batch API)
+# -------------------------------------------------
+BATCH_POLL_SECONDS = 30
+_BATCH_DONE = frozenset(("completed", "failed", "expired", "cancelled"))
+
+
+def create_llm_plans_offline(pairs: List[tuple], poll_seconds: float = BATCH_POLL_SECONDS) -> List[Dict[str, Any]]:
+    """
+    Plans for (eda, user_request) pairs through the Batch API, at half the
+    price but with up to 24h turnaround; meant for nightly or CLI runs,
+    not the app. Blocks until the batch ends. Rule-based and cached plans
+    are not sent, results are written to the response cache, and requests
+    the batch did not answer get an empty plan.
+    """
+    plans = [_empty_plan() for _ in pairs]
+    keys, lines = {}, []
+    for i, (eda, user_request) in enumerate(pairs):
+        if not _has_columns(eda) or not (user_request or "").strip():
+            continue
+        plan = try_rule_based_plan(user_request, eda) if RULE_BASED_PLANS else None
+        if plan is not None:
+            plans[i] = plan
+            continue
+
+        req = _plan_request(eda, user_request)
+        key = _cache_key(**req)
+        content = _cache_get(key)
+        if content is not None:
+            plans[i] = _parse_plan(content)
+            continue
+
+        keys[str(i)] = key
+        lines.append(_dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": req,
+        }))
+
+    if not lines:
+        return plans
+
+    client = _get_client()
+    upload = client.files.create(file=("plans.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=upload.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    while batch.status not in _BATCH_DONE:
+        time.sleep(poll_seconds)
+        batch = client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        print(f"✗ Plan batch {batch.id} ended {batch.status}")
+    if not batch.output_file_id:
+        return plans
+
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        row = _loads(line) if line.strip() else {}
+        i = row.get("custom_id")
+        body = (row.get("response") or {}).get("body") or {}
+        if i not in keys or not body.get("choices"):
+            continue
+
+        choice = body["choices"][0]
+        content = (choice.get("message") or {}).get("content") or ""
+        if choice.get("finish_reason") == "length":
+            print(f"✗ Plan batch request {i} truncated")
+            continue
+        _cache_put(keys[i], content)
+        plans[int(i)] = _parse_plan(content)
+
+    return plans